@@ -1,8 +1,11 @@
 import random
 import math
+import os
+import pickle
 import sys
 
-from analysis import hp_contacts
+from analysis import MCAccumulator, manhattan
+from binary_trajectory import BinaryTrajectoryWriter
 
 moves = {
     "R": (1, 0),
@@ -17,9 +20,172 @@ def add_vector(a, b):
     """
     return (a[0] + b[0], a[1] + b[1])
 
-def reptation_move(path):
+def lattice_neighbors(site):
     """
-    Propose a reptation move.
+    Return the four nearest-neighbor sites of a lattice site.
+    """
+    return [add_vector(site, step) for step in moves.values()]
+
+class Chain:
+    """
+    Lattice chain with an occupancy map and a running HP energy.
+
+    Every bead carries an integer label, and bead k of the chain has label
+    offset + k. A reptation move removes one end label and adds a new label
+    at the other end, so only the occupancy of the two end beads changes.
+
+    Nonbonded contacts are stored as label pairs. Reptation slides the
+    sequence along the chain by one bead, so the contact geometry changes
+    only at the ends but the H/P types of every contact shift. The energy
+    is therefore re-scored over the contact list, which is O(n), instead of
+    over all bead pairs as in hp_contacts, which is O(n^2).
+
+    Attributes
+    ----------
+    sequence : str
+        HP sequence
+    Epsilon : float
+        H-H contact strength
+    energy : float
+        HP energy of the current conformation, equal to hp_contacts(path)
+    bias_energy : float
+        Value of the bias term of a biased run (see HarmonicRestraint),
+        0 otherwise; not included in energy
+    """
+
+    def __init__(self, path, sequence, Epsilon):
+        self.sequence = sequence
+        self.Epsilon = Epsilon
+        self.n = len(path)
+        self.offset = 0
+        self.is_h = [c == "H" for c in sequence]
+
+        self.sites = {}      # label -> (x, y)
+        self.occupied = {}   # (x, y) -> label
+        self.contacts = set()
+
+        for label, site in enumerate(path):
+            self._place(label, site)
+
+        self.energy = self.contact_energy()
+        self.bias_energy = 0.0
+
+    def path(self):
+        """
+        Return the current conformation as a list of (x, y) tuples.
+        """
+        return [self.sites[self.offset + k] for k in range(self.n)]
+
+    def site(self, k):
+        """
+        Position of bead k (0-based index along the chain).
+        """
+        return self.sites[self.offset + k]
+
+    def index_at(self, site):
+        """
+        Chain index of the bead on a site, or None if the site is empty.
+        """
+        label = self.occupied.get(site)
+        if label is None:
+            return None
+        return label - self.offset
+
+    def _place(self, label, site):
+        """
+        Put a bead on an empty site and record its nonbonded contacts.
+        """
+        self.sites[label] = site
+        self.occupied[site] = label
+        for neighbor in lattice_neighbors(site):
+            other = self.occupied.get(neighbor)
+            if other is not None and abs(other - label) > 1:
+                self.contacts.add((min(label, other), max(label, other)))
+
+    def _remove(self, label):
+        """
+        Take a bead off the lattice and forget its contacts.
+
+        Returns the site it occupied.
+        """
+        site = self.sites.pop(label)
+        del self.occupied[site]
+        for neighbor in lattice_neighbors(site):
+            other = self.occupied.get(neighbor)
+            if other is not None:
+                self.contacts.discard((min(label, other), max(label, other)))
+        return site
+
+    def contact_energy(self):
+        """
+        HP energy from the stored contact list.
+
+        Each nonbonded H-H contact contributes -Epsilon, as in hp_contacts.
+        """
+        E = 0
+        offset = self.offset
+        is_h = self.is_h
+
+        for a, b in self.contacts:
+            if is_h[a - offset] and is_h[b - offset]:
+                E -= self.Epsilon
+
+        return E
+
+    def end_label(self, front):
+        """
+        Label of the first bead (front=True) or the last bead (front=False).
+        """
+        if front:
+            return self.offset
+        return self.offset + self.n - 1
+
+    def reptate(self, add_to_front, new_position):
+        """
+        Remove the bead at one end and grow a new bead at the other end.
+
+        The caller is responsible for checking that new_position is free
+        (the site of the removed bead counts as free). The energy is not
+        updated here; call contact_energy() for the new value.
+
+        Returns
+        -------
+        undo : tuple
+            Arguments that reverse the move when passed back to reptate().
+        """
+        removed = self.end_label(not add_to_front)
+        old_position = self._remove(removed)
+
+        if add_to_front:
+            self.offset -= 1
+            self._place(self.offset, new_position)
+        else:
+            self.offset += 1
+            self._place(self.offset + self.n - 1, new_position)
+
+        return (not add_to_front, old_position)
+
+    def move_beads(self, updates):
+        """
+        Move several beads at once.
+
+        updates is a list of (k, new_site) pairs. The caller is responsible
+        for checking that the new sites are free once the moved beads have
+        been lifted. The energy is not updated here.
+
+        Returns
+        -------
+        undo : list
+            (k, old_site) pairs that reverse the move when passed back.
+        """
+        undo = [(k, self._remove(self.offset + k)) for k, _ in updates]
+        for k, site in updates:
+            self._place(self.offset + k, site)
+        return undo
+
+def reptation_move(chain, rng=random):
+    """
+    Propose and apply a reptation move.
 
     With probability 1/2:
         remove the last bead and grow a new bead at the head
@@ -28,118 +194,592 @@ def reptation_move(path):
         remove the first bead and grow a new bead at the tail
 
     A trial direction is chosen uniformly from R, L, U, D.
-    If the new position overlaps with the shortened chain, the move is invalid.
+    If the new position overlaps with the shortened chain, the move is invalid
+    and the chain is left untouched.
+
+    All moves draw their random numbers from rng, which may be the random
+    module itself or a random.Random instance with its own seed.
 
     Returns
     -------
-    trial_path : list of tuples
-        Proposed new path if valid, otherwise the original path.
-    valid_move : bool
-        True if the proposed move is self-avoiding, False otherwise.
+    undo : callable or None
+        Function that reverses the move,
+        or None if the proposal was not self-avoiding.
     """
-    if random.random() < 0.5:
+    if rng.random() < 0.5:
         # remove tail, grow at head
-        shortened_path = path[:-1]
-        growth_end = shortened_path[0]
+        removed = chain.end_label(False)
+        growth_end = chain.sites[chain.end_label(True)]
         add_to_front = True
     else:
         # remove head, grow at tail
-        shortened_path = path[1:]
-        growth_end = shortened_path[-1]
+        removed = chain.end_label(True)
+        growth_end = chain.sites[chain.end_label(False)]
         add_to_front = False
 
-    move = random.choice(["R", "L", "U", "D"])
+    move = rng.choice(["R", "L", "U", "D"])
     step = moves[move]
     new_position = add_vector(growth_end, step)
 
-    if new_position in shortened_path:
-	#Here we overlap, so return the original and say that did not accept
-        return path.copy(), False
+    occupant = chain.occupied.get(new_position)
+    if occupant is not None and occupant != removed:
+        # Here we overlap, so leave the chain alone and say the move was invalid
+        return None
+
+    undo = chain.reptate(add_to_front, new_position)
+    return lambda: chain.reptate(*undo)
+
+def end_move(chain, rng=random):
+    """
+    Propose and apply an end move.
+
+    One end bead (chosen with probability 1/2 each) is put on a random
+    lattice neighbor of the bead it is bonded to.
+
+    Returns an undo function, or None if the new site is occupied or the
+    chain has a single bead.
+    """
+    if chain.n < 2:
+        return None
+
+    if rng.random() < 0.5:
+        k, anchor = 0, 1
+    else:
+        k, anchor = chain.n - 1, chain.n - 2
+
+    step = moves[rng.choice(["R", "L", "U", "D"])]
+    new_position = add_vector(chain.site(anchor), step)
+
+    if chain.index_at(new_position) not in (None, k):
+        return None
+
+    undo = chain.move_beads([(k, new_position)])
+    return lambda: chain.move_beads(undo)
+
+def corner_move(chain, rng=random):
+    """
+    Propose and apply a corner flip.
+
+    A random interior bead k sitting on a corner (beads k-1 and k+1 not
+    in a straight line) is flipped to the opposite corner of the square.
+
+    Returns an undo function, or None if bead k is not on a corner, the
+    opposite corner is occupied, or the chain has no interior bead.
+    """
+    if chain.n < 3:
+        return None
+
+    k = rng.randrange(1, chain.n - 1)
+    before = chain.site(k - 1)
+    here = chain.site(k)
+    after = chain.site(k + 1)
+
+    if before[0] == after[0] or before[1] == after[1]:
+        return None
+
+    new_position = (before[0] + after[0] - here[0], before[1] + after[1] - here[1])
+    if new_position in chain.occupied:
+        return None
+
+    undo = chain.move_beads([(k, new_position)])
+    return lambda: chain.move_beads(undo)
+
+def crankshaft_move(chain, rng=random):
+    """
+    Propose and apply a crankshaft move.
+
+    Beads k and k+1 forming a U with beads k-1 and k+2 (which are lattice
+    neighbors) are flipped to the other side of the k-1, k+2 bond.
+
+    Returns an undo function, or None if there is no U at k, the
+    flipped sites are occupied, or the chain is shorter than four beads.
+    """
+    if chain.n < 4:
+        return None
+
+    k = rng.randrange(1, chain.n - 2)
+    a = chain.site(k - 1)
+    b = chain.site(k)
+    c = chain.site(k + 1)
+    d = chain.site(k + 2)
+
+    arm = (b[0] - a[0], b[1] - a[1])
+    if manhattan(a, d) != 1 or (c[0] - d[0], c[1] - d[1]) != arm:
+        return None
+
+    new_b = (a[0] - arm[0], a[1] - arm[1])
+    new_c = (d[0] - arm[0], d[1] - arm[1])
+    if new_b in chain.occupied or new_c in chain.occupied:
+        return None
+
+    undo = chain.move_beads([(k, new_b), (k + 1, new_c)])
+    return lambda: chain.move_beads(undo)
+
+# The seven non-identity symmetries of the square lattice
+lattice_symmetries = [
+    lambda x, y: (-y, x),    # rotate 90
+    lambda x, y: (-x, -y),   # rotate 180
+    lambda x, y: (y, -x),    # rotate 270
+    lambda x, y: (x, -y),    # reflect in x axis
+    lambda x, y: (-x, y),    # reflect in y axis
+    lambda x, y: (y, x),     # reflect in diagonal
+    lambda x, y: (-y, -x)    # reflect in anti-diagonal
+]
+
+def pivot_move(chain, rng=random):
+    """
+    Propose and apply a pivot move.
 
-    if add_to_front:
-        trial_path = [new_position] + shortened_path
+    A random interior bead is the pivot. The shorter arm of the chain
+    beyond it is rotated or reflected about the pivot by one of the seven
+    lattice symmetries. Beads are checked from the pivot outwards, where
+    collisions are most likely, and the check stops at the first overlap.
+
+    Returns an undo function, or None on overlap or if the chain has no
+    interior bead.
+    """
+    if chain.n < 3:
+        return None
+
+    p = rng.randrange(1, chain.n - 1)
+    transform = rng.choice(lattice_symmetries)
+
+    if p < chain.n - 1 - p:
+        arm = range(p - 1, -1, -1)
+        fixed = lambda i: i >= p
     else:
-        trial_path = shortened_path + [new_position]
+        arm = range(p + 1, chain.n)
+        fixed = lambda i: i <= p
+
+    px, py = chain.site(p)
+    updates = []
+    for k in arm:
+        x, y = chain.site(k)
+        dx, dy = transform(x - px, y - py)
+        new_position = (px + dx, py + dy)
+
+        occupant = chain.index_at(new_position)
+        if occupant is not None and fixed(occupant):
+            return None
+
+        updates.append((k, new_position))
+
+    undo = chain.move_beads(updates)
+    return lambda: chain.move_beads(undo)
+
+# Registry of available proposals; weights in run_mc refer to these names
+move_set = {
+    "reptation": reptation_move,
+    "end": end_move,
+    "corner": corner_move,
+    "crankshaft": crankshaft_move,
+    "pivot": pivot_move
+}
 
-    return trial_path, True
+def move_chooser(move_weights, rng=random):
+    """
+    Build a function that picks a move name according to move_weights.
 
-def mc_step(path, sequence, Beta, Epsilon):
+    move_weights maps names in move_set to relative weights. With a single
+    move no random number is drawn, so the default reptation-only run
+    consumes the random stream exactly as before.
+    """
+    names = [name for name, weight in move_weights.items() if weight > 0]
+    for name in names:
+        if name not in move_set:
+            raise ValueError(f"Unknown move {name!r}; choose from {sorted(move_set)}")
+
+    if len(names) == 1:
+        only = names[0]
+        return lambda: only
+
+    total = sum(move_weights[name] for name in names)
+    cumulative = []
+    running = 0.0
+    for name in names:
+        running += move_weights[name] / total
+        cumulative.append(running)
+
+    def choose():
+        r = rng.random()
+        for name, edge in zip(names, cumulative):
+            if r < edge:
+                return name
+        return names[-1]
+
+    return choose
+
+def score_move(chain, bias=None):
+    """
+    Energy change of the move just applied to chain.
+
+    Returns (new_energy, new_bias, deltaE), where new_bias is None
+    without a bias and deltaE includes the change of the bias.
+    """
+    new_energy = chain.contact_energy()
+    deltaE = new_energy - chain.energy
+    new_bias = None
+
+    if bias is not None:
+        new_bias = bias(chain)
+        deltaE += new_bias - chain.bias_energy
+
+    return new_energy, new_bias, deltaE
+
+def metropolis(chain, Beta, undo, trial, rng=random):
+    """
+    Keep the move scored by score_move with the Metropolis probability,
+    or take it back with undo. Returns True if the move was accepted.
     """
-    Perform one Monte Carlo step using reptation and Metropolis acceptance.
+    new_energy, new_bias, deltaE = trial
+
+    if deltaE <= 0 or rng.random() < math.exp(-Beta * deltaE):
+        chain.energy = new_energy
+        if new_bias is not None:
+            chain.bias_energy = new_bias
+        return True
+
+    undo()
+    return False
+
+def mc_step(chain, Beta, move=reptation_move, rng=random, bias=None):
+    """
+    Perform one Monte Carlo step using one proposal and Metropolis acceptance.
+
+    The chain is updated in place and chain.energy always holds the energy
+    of the current conformation. With a bias, moves are accepted on the
+    HP energy plus bias(chain), and chain.bias_energy holds the bias of
+    the current conformation. The step is move, score_move and
+    metropolis in turn; instrumentation.Profiler times the same three.
 
     Returns
     -------
-    new_path : list of tuples
-        Updated path after accept/reject.
     accepted : bool
         True if the move was accepted.
     valid_move : bool
         True if the proposed move was geometrically valid.
     """
-    old_energy = hp_contacts(path, sequence, Epsilon)
+    undo = move(chain, rng)
 
-    trial_path, valid_move = reptation_move(path)
+    if undo is None:
+        return False, False
 
-    if not valid_move:
-        return path, False, False
+    return metropolis(chain, Beta, undo, score_move(chain, bias), rng), True
 
-    new_energy = hp_contacts(trial_path, sequence, Epsilon)
-    deltaE = new_energy - old_energy
+class HarmonicRestraint:
+    """
+    Bias k_force * (d - d0)^2 on the Manhattan distance d of beads i and j.
+
+    With d0 = 1 this is restrained_analysis.calculate_restraint_energy,
+    so MC samples the same restrained ensemble as the enumeration code.
+    Other centers d0 give umbrella-sampling windows (see umbrella.py).
+    The two beads are looked up through Chain.site, so evaluating the
+    bias is O(1) after any move, including reptation.
+    """
 
-    if deltaE <= 0:
-        return trial_path, True, True
+    def __init__(self, bead_i, bead_j, k_force, d0=1):
+        self.bead_i = bead_i
+        self.bead_j = bead_j
+        self.k_force = k_force
+        self.d0 = d0
 
-    if random.random() < math.exp(-Beta * deltaE):
-        return trial_path, True, True
+    def distance(self, chain):
+        a = chain.site(self.bead_i)
+        b = chain.site(self.bead_j)
+        return abs(a[0] - b[0]) + abs(a[1] - b[1])
 
-    return path, False, True
+    def __call__(self, chain):
+        return self.k_force * (self.distance(chain) - self.d0) ** 2
 
-def run_mc(sequence, initial_path, n_steps, Beta, Epsilon):
+def as_sink(sink):
     """
-    Run a Monte Carlo simulation for an HP lattice polymer.
+    Turn a sink argument into a single callable.
+
+    A sink is any callable sink(step, path, energy). A list or tuple of
+    sinks is combined so every frame goes to each of them in turn.
+    """
+    if sink is None or callable(sink):
+        return sink
+
+    sinks = list(sink)
+
+    def fan_out(step, path, energy):
+        for s in sinks:
+            s(step, path, energy)
+
+    return fan_out
+
+def sink_list(sink):
+    """
+    The individual sinks in a sink argument, as a list.
+    """
+    if sink is None:
+        return []
+    if callable(sink):
+        return [sink]
+    return list(sink)
+
+def save_checkpoint(filename, state):
+    """
+    Write a checkpoint atomically.
+
+    The state is pickled to a temporary file that then replaces filename,
+    so a job killed mid-write leaves the previous checkpoint intact.
+    """
+    tmp = filename + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, filename)
+
+def load_checkpoint(filename):
+    """
+    Read a checkpoint written by run_mc.
+
+    Returns a dict with sequence, Epsilon, path, energy, step,
+    accepted_moves, invalid_moves, rng_state, move_stats and sink_states.
+    """
+    with open(filename, "rb") as f:
+        return pickle.load(f)
+
+def new_move_stats(move_weights):
+    """
+    Empty proposed/valid/accepted counters for each move in move_weights.
+    """
+    return {name: {"proposed": 0, "valid": 0, "accepted": 0} for name in move_weights}
+
+def run_chain(chain, n_steps, Beta, sink=None, stride=1, first_step=0,
+              move_weights=None, move_stats=None, rng=None, profiler=None, bias=None):
+    """
+    Advance a Chain in place by n_steps Monte Carlo steps.
+
+    Frames are passed to sink(step, path, energy) as they are produced,
+    for every step that is a multiple of stride. Nothing is kept in memory.
 
     Parameters
     ----------
-    sequence : str
-        HP sequence
-    initial_path : list of tuples
-        Starting conformation
+    chain : Chain
+        Current state, updated in place
     n_steps : int
         Number of Monte Carlo steps
     Beta : float
         Inverse temperature
-    Epsilon : float
-        H-H contact strength
+    sink : callable, list of callables or None
+        Receives the saved frames
+    stride : int
+        Save every stride-th step
+    first_step : int
+        Step number of the current state, so segments can be chained
+    move_weights : dict or None
+        Relative weights of the moves in move_set (default: reptation only)
+    move_stats : dict or None
+        If given, per-move "proposed", "valid" and "accepted" counters are
+        added to it (see new_move_stats)
+    rng : random.Random or None
+        Random number stream (default: the global random module)
+    profiler : instrumentation.Profiler or None
+        If given, steps are timed and counted by the profiler
+    bias : callable or None
+        Extra energy term bias(chain) added to the HP energy in the
+        acceptance test, e.g. a HarmonicRestraint. Sinks still receive
+        the HP energy.
 
     Returns
     -------
-    trajectory : list
-        List of sampled paths
-    energies : list
-        Energy at each step
     accepted_moves : int
         Number of accepted moves
     invalid_moves : int
         Number of invalid proposals
     """
-    path = initial_path.copy()
+    sink = as_sink(sink)
+    step_function = mc_step
 
-    trajectory = [path.copy()]
-    energies = [hp_contacts(path, sequence, Epsilon)]
+    if profiler is not None:
+        sink = profiler.timed_sink(sink)
+        step_function = profiler.mc_step
+
+    if rng is None:
+        rng = random
+    if move_weights is None:
+        move_weights = {"reptation": 1.0}
+    choose = move_chooser(move_weights, rng)
+
+    if move_stats is not None:
+        for name, counters in new_move_stats(move_weights).items():
+            move_stats.setdefault(name, counters)
+
+    if bias is not None:
+        chain.bias_energy = bias(chain)
 
     accepted_moves = 0
     invalid_moves = 0
 
-    for step in range(n_steps):
-        path, accepted, valid_move = mc_step(path, sequence, Beta, Epsilon)
+    for step in range(first_step + 1, first_step + n_steps + 1):
+        name = choose()
+        accepted, valid_move = step_function(chain, Beta, move_set[name], rng, bias)
 
         if accepted:
             accepted_moves += 1
         if not valid_move:
             invalid_moves += 1
 
-        trajectory.append(path.copy())
-        energies.append(hp_contacts(path, sequence, Epsilon))
+        if move_stats is not None:
+            counters = move_stats[name]
+            counters["proposed"] += 1
+            counters["valid"] += valid_move
+            counters["accepted"] += accepted
+
+        if sink is not None and step % stride == 0:
+            sink(step, chain.path(), chain.energy)
+
+    return accepted_moves, invalid_moves
+
+def run_mc(sequence, initial_path, n_steps, Beta, Epsilon, sink=None, stride=1,
+           move_weights=None, move_stats=None, rng=None,
+           checkpoint=None, checkpoint_every=None, resume=False, profiler=None, bias=None):
+    """
+    Run a Monte Carlo simulation for an HP lattice polymer.
+
+    Parameters
+    ----------
+    sequence : str
+        HP sequence
+    initial_path : list of tuples
+        Starting conformation
+    n_steps : int
+        Number of Monte Carlo steps
+    Beta : float
+        Inverse temperature
+    Epsilon : float
+        H-H contact strength
+    sink : callable, list of callables or None
+        If given, frames are streamed to sink(step, path, energy) instead
+        of being collected, e.g. a TrajectoryWriter, an
+        analysis.MCAccumulator or any function. Memory use is then
+        independent of n_steps.
+    stride : int
+        Keep (or stream) the initial frame and every stride-th step
+    move_weights : dict or None
+        Mixing weights over move_set, e.g. {"reptation": 1, "pivot": 0.2}.
+        Default is reptation only.
+    move_stats : dict or None
+        Filled with per-move proposed/valid/accepted counters
+    rng : random.Random or None
+        Random number stream; pass random.Random(seed) for a reproducible
+        run that does not share state with other runs (default: the global
+        random module)
+    checkpoint : str or None
+        File holding the current path, counters, step, RNG state and the
+        state of sinks that support it (see below). Written every
+        checkpoint_every steps and at the end of the run.
+    checkpoint_every : int or None
+        Steps between checkpoints (default: only at the end)
+    resume : bool
+        Continue from checkpoint if the file exists. n_steps is the total
+        length of the run, so a larger n_steps extends a finished run.
+        The continuation is bit-identical to an uninterrupted run.
+    profiler : instrumentation.Profiler or None
+        Records steps/second, the time split between proposal, energy
+        evaluation, acceptance and I/O, and rolling acceptance rates
+    bias : callable or None
+        Extra energy term bias(chain) used in the acceptance test, e.g.
+        HarmonicRestraint(bead_i, bead_j, k_force). Frames and energies
+        still carry the HP energy.
+
+    Sinks with checkpoint_state() and restore_state(state) methods, such as
+    MCAccumulator and the trajectory writers, are saved and restored with
+    the run. Open trajectory writers in append mode when resuming; frames
+    written after the last checkpoint are truncated away. The writers
+    save their file name (and bead count), and resuming raises ValueError
+    if the file was replaced or is shorter than the saved offset.
+
+    Returns
+    -------
+    trajectory : list or None
+        List of sampled paths (None when streaming to a sink). After a
+        resume only the frames of the continued part are included.
+    energies : list or None
+        Energy of each sampled path (None when streaming to a sink)
+    accepted_moves : int
+        Number of accepted moves
+    invalid_moves : int
+        Number of invalid proposals
+    """
+    if rng is None:
+        rng = random
+    if move_stats is None:
+        move_stats = {}
+
+    stateful_sinks = [s for s in sink_list(sink) if hasattr(s, "checkpoint_state")]
+
+    if sink is None:
+        trajectory = []
+        energies = []
+
+        def collect(step, path, energy):
+            trajectory.append(path)
+            energies.append(energy)
+
+        frame_sink = collect
+    else:
+        trajectory = None
+        energies = None
+        frame_sink = as_sink(sink)
+
+    if resume and checkpoint is not None and os.path.exists(checkpoint):
+        state = load_checkpoint(checkpoint)
+        if state["sequence"] != sequence:
+            raise ValueError(f"Checkpoint {checkpoint} is for sequence {state['sequence']}")
+
+        if len(state["sink_states"]) != len(stateful_sinks):
+            raise ValueError(f"Checkpoint {checkpoint} has {len(state['sink_states'])} sink states, "
+                             f"but {len(stateful_sinks)} checkpointable sinks were given")
+
+        chain = Chain(state["path"], sequence, Epsilon)
+        step = state["step"]
+        accepted_moves = state["accepted_moves"]
+        invalid_moves = state["invalid_moves"]
+        rng.setstate(state["rng_state"])
+        move_stats.update(state["move_stats"])
+        for s, sink_state in zip(stateful_sinks, state["sink_states"]):
+            s.restore_state(sink_state)
+    else:
+        chain = Chain(initial_path, sequence, Epsilon)
+        step = 0
+        accepted_moves = 0
+        invalid_moves = 0
+        frame_sink(0, chain.path(), chain.energy)
+
+    if checkpoint_every is None:
+        checkpoint_every = max(n_steps - step, 1)
+
+    while step < n_steps:
+        segment = min(checkpoint_every, n_steps - step)
+
+        accepted, invalid = run_chain(chain, segment, Beta, frame_sink, stride, first_step=step,
+                                      move_weights=move_weights, move_stats=move_stats, rng=rng,
+                                      profiler=profiler, bias=bias)
+        step += segment
+        accepted_moves += accepted
+        invalid_moves += invalid
+
+        if checkpoint is not None:
+            state = {
+                "sequence": sequence,
+                "Epsilon": Epsilon,
+                "path": chain.path(),
+                "energy": chain.energy,
+                "step": step,
+                "accepted_moves": accepted_moves,
+                "invalid_moves": invalid_moves,
+                "rng_state": rng.getstate(),
+                "move_stats": move_stats,
+                "sink_states": [s.checkpoint_state() for s in stateful_sinks]
+            }
+            if profiler is None:
+                save_checkpoint(checkpoint, state)
+            else:
+                with profiler.section("io"):
+                    save_checkpoint(checkpoint, state)
 
     return trajectory, energies, accepted_moves, invalid_moves
 
@@ -152,7 +792,55 @@ def straight_path(sequence):
         path.append((i, 0))
     return path
 
-def write_trajectory(trajectory, energies, filename="trajectory.txt"):
+class TrajectoryWriter:
+    """
+    Sink that writes frames to a text trajectory as they arrive.
+
+    Each line contains:
+    step | energy | x0,y0 x1,y1 x2,y2 ...
+
+    Use it as a context manager, or call close() when done.
+    """
+
+    def __init__(self, filename="trajectory.txt", mode="w"):
+        self.filename = filename
+        self.f = open(filename, mode)
+
+    def __call__(self, step, path, energy):
+        coords = " ".join(f"{x},{y}" for (x, y) in path)
+        self.f.write(f"{step} {energy} {coords}\n")
+
+    def checkpoint_state(self):
+        self.f.flush()
+        return {"filename": os.path.basename(self.filename), "position": self.f.tell()}
+
+    def restore_state(self, state):
+        """
+        Drop the lines written after the checkpoint; raises ValueError if
+        the file is another one or shorter than the saved offset.
+        """
+        if state["filename"] != os.path.basename(self.filename):
+            raise ValueError(f"Checkpoint was taken with {state['filename']}, not {self.filename}")
+
+        self.f.flush()
+        size = os.path.getsize(self.filename)
+        if size < state["position"]:
+            raise ValueError(f"{self.filename} has {size} bytes, less than the checkpoint offset "
+                             f"{state['position']}; it was replaced since")
+
+        self.f.truncate(state["position"])
+        self.f.seek(state["position"])
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def write_trajectory(trajectory, energies, filename="trajectory.txt", stride=1):
     """
     Write the Monte Carlo trajectory to a text file.
 
@@ -160,36 +848,85 @@ def write_trajectory(trajectory, energies, filename="trajectory.txt"):
     step | energy | x0,y0 x1,y1 x2,y2 ...
 
     This format is easy to read back later for analysis.
+    Use the same stride that was passed to run_mc so step numbers match.
     """
-    with open(filename, "w") as f:
-        for step, (path, energy) in enumerate(zip(trajectory, energies)):
-            coords = " ".join(f"{x},{y}" for (x, y) in path)
-            f.write(f"{step} {energy} {coords}\n")
+    with TrajectoryWriter(filename) as writer:
+        for frame, (path, energy) in enumerate(zip(trajectory, energies)):
+            writer(frame * stride, path, energy)
 
 if __name__ == "__main__":
     #If this script is the driver then execute the following
+    from instrumentation import Profiler
+
     Beta = 10.0 / 6.0
     Epsilon = 1
 
-    sequence = sys.argv[1]
-    n_steps = int(sys.argv[2])
+    # --resume continues a killed or finished run from its checkpoint;
+    # rerun with a larger n_steps to extend it. Without it every run is new.
+    resume = "--resume" in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != "--resume"]
+
+    if len(args) < 2:
+        print("Usage: python3 MC.py <sequence> <n_steps> [stride] [checkpoint] [metrics_file] [--resume]")
+        sys.exit()
+
+    sequence = args[0]
+    n_steps = int(args[1])
+    stride = int(args[2]) if len(args) > 2 else 1
+    checkpoint = args[3] if len(args) > 3 else f"checkpoint_{sequence}.pkl"
+    metrics_file = args[4] if len(args) > 4 else None
+    trajectory_file = f"trajectory_{sequence}.hptraj"
+
+    if resume and not os.path.exists(checkpoint):
+        print("No checkpoint to resume from:", checkpoint)
+        sys.exit(1)
+    if resume and not os.path.exists(trajectory_file):
+        print("Trajectory of the checkpointed run is missing:", trajectory_file)
+        sys.exit(1)
 
     initial_path = straight_path(sequence)
-
-    trajectory, energies, accepted_moves, invalid_moves = run_mc(
-        sequence,
-        initial_path,
-        n_steps,
-        Beta,
-        Epsilon
-    )
-
-    write_trajectory(trajectory, energies)
+    acc = MCAccumulator(Beta)
+    profiler = Profiler() if metrics_file else None
+
+    # Frames go straight to disk, so memory does not grow with n_steps.
+    # Use binary_trajectory.py to convert older text trajectories.
+    mode = "ab" if resume else "wb"
+    with BinaryTrajectoryWriter(trajectory_file, len(sequence), mode) as writer:
+        _, _, accepted_moves, invalid_moves = run_mc(
+            sequence,
+            initial_path,
+            n_steps,
+            Beta,
+            Epsilon,
+            sink=[writer, acc],
+            stride=stride,
+            checkpoint=checkpoint,
+            checkpoint_every=100000,
+            resume=resume,
+            profiler=profiler
+        )
+
+    final = load_checkpoint(checkpoint)
+    averages = acc.results()
 
     print("Sequence:", sequence)
+    print("Trajectory file:", trajectory_file)
     print("Initial path:", initial_path)
-    print("Final path:", trajectory[-1])
-    print("Final energy:", energies[-1])
+    print("Final path:", final["path"])
+    print("Final energy:", final["energy"])
     print("Accepted moves:", accepted_moves)
     print("Invalid moves:", invalid_moves)
     print("Acceptance ratio:", accepted_moves / n_steps)
+    print("Average energy:", averages["avg_energy"], "+/-", averages["err_energy"])
+    print("Average end2end:", averages["avg_end2end"], "+/-", averages["err_end2end"])
+    print("Average Rg:", averages["avg_rg"], "+/-", averages["err_rg"])
+    print("Cv:", averages["Cv"])
+
+    if profiler is not None:
+        # JSON gets the full summary, a .csv name gets the rolling windows
+        if metrics_file.endswith(".csv"):
+            profiler.export_csv(metrics_file)
+        else:
+            profiler.export_json(metrics_file)
+        print("Steps per second:", profiler.summary()["steps_per_second"])
+        print("Metrics file:", metrics_file)
@@ -1,8 +1,16 @@
 from collections import Counter
 import math
+
+import numpy as np
+
+from binary_trajectory import BinaryTrajectory, decode_coordinates
+
 Epsilon = 1
 kT = 0.6
 
+# Largest x with exp(x) finite as a float
+max_log_float = math.log(np.finfo(float).max)
+
 """
 Analysis routines for HP lattice model.
 
@@ -35,10 +43,7 @@ def hp_contacts(path, sequence, Epsilon):
     return E
 
 def partition_function(all_paths, sequence, kT, Epsilon):
-    Z = 0
-    for path in all_paths:
-        Z += math.exp(-hp_contacts(path, sequence, Epsilon)/kT)
-    return Z
+    return partition_sum(batch_properties(all_paths, sequence, Epsilon)["energy"], kT)
 
 def probability(path, sequence, Z, kT, Epsilon):
     return math.exp(-hp_contacts(path, sequence, Epsilon)/kT) / Z
@@ -66,18 +71,8 @@ def radius_of_gyration(path):
     return calculate_radius_of_gyration(path)
 
 def average_rg(paths, sequence, Epsilon, kT):
-    Z = 0.0
-    weighted = 0.0
-
-    for path in paths:
-        E = hp_contacts(path, sequence, Epsilon)
-        rg = calculate_radius_of_gyration(path)
-
-        w = math.exp(-E/kT)
-        Z += w
-        weighted += rg * w
-
-    return weighted / Z
+    props = batch_properties(paths, sequence, Epsilon)
+    return float(boltzmann_weights(props["energy"], kT)[0] @ props["rg"])
 
 def entropy_term(path, sequence, Z, kT, Epsilon):
     """
@@ -93,10 +88,7 @@ def entropy_from_definition(expected_energy, Z, kT):
     return expected_energy/kT + math.log(Z)
 
 def energies_of_paths(all_paths, sequence, Epsilon):
-    energies = []
-    for path in all_paths:
-        energies.append(hp_contacts(path, sequence, Epsilon))
-    return energies
+    return energy_values(batch_properties(all_paths, sequence, Epsilon), Epsilon)
 
 def macrostates(all_paths, sequence, Epsilon):
     """
@@ -110,56 +102,260 @@ def lowest_energy_microstates(paths, sequence, Epsilon):
         min_energy: lowest energy found
         lowest_paths: all microstates having that lowest energy
     """
-    energies = []
-
-    for path in paths:
-        E = hp_contacts(path, sequence, Epsilon)
-        energies.append((E, path))
+    contacts = batch_properties(paths, sequence, Epsilon)["contacts"]
+    table = contact_energies(int(contacts.max(initial=0)), Epsilon)
+    energies = np.array(table)[contacts]
 
-    min_energy = min(E for E, path in energies)
-    lowest_paths = [path for E, path in energies if E == min_energy]
+    lowest = np.flatnonzero(energies == energies.min())
+    min_energy = table[contacts[lowest[0]]]
+    lowest_paths = [paths[i] for i in lowest]
 
     return min_energy, lowest_paths
 
+def hh_pairs(sequence):
+    """
+    Index arrays (i, j) of the H-H pairs that can be nonbonded lattice
+    neighbors. On the square lattice j - i must be odd and at least 3.
+    """
+    h = [k for k, c in enumerate(sequence) if c == "H"]
+    pairs = [(i, j) for i in h for j in h if j >= i + 3 and (j - i) % 2 == 1]
+    return (np.array([i for i, j in pairs], dtype=np.intp),
+            np.array([j for i, j in pairs], dtype=np.intp))
+
+def as_coordinates(conformations, n_beads):
+    """
+    (N, n_beads, 2) coordinates from a list of paths, a coordinate array,
+    or an (N, packed_size) uint8 array of packed bond codes (the bonds of
+    a BinaryTrajectory or a contact_cache.WalkCache), placed at the origin.
+    """
+    if isinstance(conformations, np.ndarray) and conformations.dtype == np.uint8 and conformations.ndim == 2:
+        origins = np.zeros((len(conformations), 2), dtype=np.int32)
+        return decode_coordinates(origins, conformations, n_beads).astype(np.int64)
+
+    return np.asarray(conformations, dtype=np.int64).reshape(len(conformations), n_beads, 2)
+
+def batch_properties(conformations, sequence, Epsilon, bead_pairs=(), chunk_size=100000):
+    """
+    HP energies, Rg and end-to-end distances of many conformations at once.
+
+    Parameters
+    ----------
+    conformations : list of paths, (N, n, 2) array, or (N, packed_size) uint8 packed bonds
+    sequence : str
+        HP sequence
+    Epsilon : float
+        H-H contact strength
+    bead_pairs : list of (i, j)
+        Bead pairs whose Manhattan distances should also be returned
+    chunk_size : int
+        Conformations processed per vectorized pass, to bound memory
+
+    Returns
+    -------
+    props : dict
+        Arrays of length N: "energy" (as hp_contacts), "contacts" (H-H
+        contact counts), "rg", "end2end", and "distance" of shape
+        (N, len(bead_pairs)).
+    """
+    n = len(sequence)
+    N = len(conformations)
+    pair_i, pair_j = hh_pairs(sequence)
+    bead_i = np.array([i for i, j in bead_pairs], dtype=np.intp)
+    bead_j = np.array([j for i, j in bead_pairs], dtype=np.intp)
+
+    contacts = np.empty(N, dtype=np.int64)
+    rg = np.empty(N)
+    end2end = np.empty(N)
+    distance = np.empty((N, len(bead_pairs)), dtype=np.int64)
+
+    for start in range(0, N, chunk_size):
+        stop = min(start + chunk_size, N)
+        coords = as_coordinates(conformations[start:stop], n)
+
+        d = np.abs(coords[:, pair_i] - coords[:, pair_j]).sum(axis=2)
+        contacts[start:stop] = (d == 1).sum(axis=1)
+
+        centered = coords - coords.mean(axis=1, keepdims=True)
+        rg[start:stop] = np.sqrt((centered ** 2).sum(axis=2).mean(axis=1))
+        end2end[start:stop] = np.sqrt(((coords[:, -1] - coords[:, 0]) ** 2).sum(axis=1))
+        distance[start:stop] = np.abs(coords[:, bead_i] - coords[:, bead_j]).sum(axis=2)
+
+    return {
+        "energy": np.array(contact_energies(int(contacts.max(initial=0)), Epsilon))[contacts],
+        "contacts": contacts,
+        "rg": rg,
+        "end2end": end2end,
+        "distance": distance
+    }
+
+def contact_energies(max_contacts, Epsilon):
+    """
+    Energy of 0, 1, ..., max_contacts H-H contacts, accumulated the same
+    way as in hp_contacts so the values match it exactly.
+    """
+    energies = [0]
+    for _ in range(max_contacts):
+        energies.append(energies[-1] - Epsilon)
+    return energies
+
+def energy_values(props, Epsilon):
+    """
+    Energies from batch_properties as plain Python numbers, as hp_contacts gives.
+    """
+    contacts = props["contacts"].tolist()
+    table = contact_energies(max(contacts, default=0), Epsilon)
+    return [table[c] for c in contacts]
+
+def log_partition_function(energies, kT):
+    log_w = -np.asarray(energies) / kT
+    shift = log_w.max()
+    return float(shift + np.log(np.exp(log_w - shift).sum()))
+
+def partition_sum(energies, kT):
+    """
+    Z = sum of exp(-E/kT), or inf when it does not fit in a float.
+
+    When no overflow is possible the weights are added in order, as a
+    loop over the paths would, so Z is exact where that loop is (e.g.
+    272.0 for 272 paths of energy 0). Otherwise Z is exp(shift) times
+    the sum of the weights relative to the largest one.
+    """
+    log_w = -np.asarray(energies) / kT
+    shift = float(log_w.max())
+
+    if shift + math.log(len(log_w)) < max_log_float:
+        return float(np.cumsum(np.exp(log_w))[-1])
+
+    try:
+        return math.exp(shift) * float(np.exp(log_w - shift).sum())
+    except OverflowError:
+        return math.inf
+
+def boltzmann_weights(energies, kT):
+    """
+    Normalized probabilities exp(-E/kT) / Z and ln Z, computed with
+    log-sum-exp so neither overflows.
+    """
+    log_w = -np.asarray(energies) / kT
+    ln_Z = log_partition_function(energies, kT)
+    return np.exp(log_w - ln_Z), ln_Z
+
 def analyze_paths(all_paths, sequence, kT, Epsilon):
     """
     Run the same analysis from class and return the results in a dictionary.
+
+    Each path is scored once by batch_properties, and the Boltzmann
+    weights are normalized in the log domain, so the averages stay finite
+    where exp(-E/kT) would overflow. ln_Z is returned as well, and Z is
+    inf when it does not fit in a float.
     """
-    Z = partition_function(all_paths, sequence, kT, Epsilon)
+    props = batch_properties(all_paths, sequence, Epsilon)
+    energies = props["energy"]
 
-    sum_end2end = 0
-    sum_rg = 0
-    avg_rg = 0.0  
-    average_end2end = 0
-    average_energy = 0
-    entropy1 = 0
-    energies = []
+    p, ln_Z = boltzmann_weights(energies, kT)
+    Z = partition_sum(energies, kT)
+
+    average_energy = float(p @ energies)
+
+    results = {
+        "Z": Z,
+        "ln_Z": ln_Z,
+        "n_paths": len(all_paths),
+        "avg_rg": float(p @ props["rg"]),
+        "average_end2end": float(p @ props["end2end"]),
+        "average_energy": average_energy,
+        "S1": float(-(p * (-energies / kT - ln_Z)).sum()),
+        "S2": average_energy / kT + ln_Z,
+        "macrostates": Counter(energy_values(props, Epsilon))
+    }
+
+    return results
+
+def merge_histograms(histograms):
+    """
+    Add up energy histograms from enumeration.energy_histogram, e.g. of
+    separate subtrees. Bins are combined in the order given.
+    """
+    merged = {}
+    for histogram in histograms:
+        for E, b in histogram.items():
+            if E not in merged:
+                merged[E] = dict.fromkeys(b, 0)
+            for key, value in b.items():
+                merged[E][key] += value
+    return {E: merged[E] for E in sorted(merged)}
+
+def histogram_arrays(histogram):
+    """
+    Energies, degeneracies and observable sums of a histogram as arrays.
+    """
+    E = np.array(list(histogram), dtype=float)
+    columns = {key: np.array([b[key] for b in histogram.values()], dtype=float)
+               for key in ["count", "sum_rg", "sum_rg2", "sum_end2end"]}
+    return E, columns
+
+def cumulants(E, ln_g, temperatures):
+    """
+    ln Z, Boltzmann weights per level (rows normalized), <E>, k2 and k3
+    for every kT in temperatures, from energy levels E with log
+    degeneracies ln_g.
+
+    Sums over levels are done in the log domain, relative to the lowest
+    energy, so ln Z stays finite where Z itself overflows.
+    """
+    kT = np.atleast_1d(np.asarray(temperatures, dtype=float))[:, None]
+
+    log_w = -(E[None, :] - E.min()) / kT + np.asarray(ln_g, dtype=float)[None, :]
+    shift = log_w.max(axis=1, keepdims=True)
+    w = np.exp(log_w - shift)
+    Z_shifted = w.sum(axis=1, keepdims=True)
+    p = w / Z_shifted
+
+    ln_Z = (shift + np.log(Z_shifted))[:, 0] - E.min() / kT[:, 0]
+    mean = p @ E
+    dE = E[None, :] - mean[:, None]
+    k2 = (p * dE ** 2).sum(axis=1)
+    k3 = (p * dE ** 3).sum(axis=1)
+    return ln_Z, p, mean, k2, k3
+
+def analyze_histogram(histogram, kT):
+    """
+    Exact thermodynamics at temperature kT from an energy histogram.
+
+    Gives the keys of analyze_paths (with avg_rg being the Boltzmann
+    average) plus ln_Z, F, Cv and avg_rg2. The sums over energy levels are
+    those of cumulants, so ln_Z stays finite where Z itself overflows.
+    """
+    E, columns = histogram_arrays(histogram)
+    g = columns["count"]
 
-    for path in all_paths:
-        e = hp_contacts(path, sequence, Epsilon)
-        p = probability(path, sequence, Z, kT, Epsilon)
-        r = end_to_end(path)
-        rg = radius_of_gyration(path)
+    ln_Z, p, mean, k2, _ = cumulants(E, np.log(g), kT)
+    ln_Z = float(ln_Z[0])
+    p = p[0]
+    average_energy = float(mean[0])
 
-        sum_end2end += r
-        sum_rg += rg
-        average_end2end += p * r
-        avg_rg += p * rg
-        average_energy += p * e
-        entropy1 -= entropy_term(path, sequence, Z, kT, Epsilon)
-        energies.append(e)
+    try:
+        Z = math.exp(ln_Z)
+    except OverflowError:
+        Z = math.inf
 
-    macro = Counter(energies)
+    # Level probabilities over degeneracies give per-microstate weights
+    per_state = p / g
 
     results = {
         "Z": Z,
-        "n_paths": len(all_paths),
-        "avg_rg": avg_rg,
-        "average_end2end": average_end2end,
+        "ln_Z": ln_Z,
+        "n_paths": int(g.sum()),
+        "avg_rg": float(per_state @ columns["sum_rg"]),
+        "avg_rg2": float(per_state @ columns["sum_rg2"]),
+        "average_end2end": float(per_state @ columns["sum_end2end"]),
         "average_energy": average_energy,
-        "S1": entropy1,
-        "S2": entropy_from_definition(average_energy, Z, kT),
-        "macrostates": macro
+        "Cv": float(k2[0]) / (kT * kT),
+        "F": -kT * ln_Z,
+        # S1 = -sum_i p_i ln p_i, with ln p_i = -E_i/kT - ln Z
+        "S1": float(p @ (E / kT + ln_Z)),
+        "S2": average_energy / kT + ln_Z,
+        "macrostates": Counter({E: b["count"] for E, b in histogram.items()})
     }
 
     return results
@@ -196,24 +392,171 @@ def read_trajectory(filename):
     return trajectory, energies
 
 
+class BinningAccumulator:
+    """
+    Running mean of a correlated series with binning-analysis error bars.
+
+    Values are averaged pairwise into blocks of 1, 2, 4, 8, ... frames as
+    they arrive. Only the sums per level and one pending value per level
+    are kept, so memory grows with log2 of the number of frames.
+    """
+
+    def __init__(self):
+        self.count = []
+        self.sum = []
+        self.sum2 = []
+        self.pending = []
+
+    def add(self, x):
+        level = 0
+        while True:
+            if level == len(self.count):
+                self.count.append(0)
+                self.sum.append(0.0)
+                self.sum2.append(0.0)
+                self.pending.append(None)
+
+            self.count[level] += 1
+            self.sum[level] += x
+            self.sum2[level] += x * x
+
+            if self.pending[level] is None:
+                self.pending[level] = x
+                return
+
+            x = (self.pending[level] + x) / 2
+            self.pending[level] = None
+            level += 1
+
+    def mean(self):
+        return self.sum[0] / self.count[0]
+
+    def level_errors(self):
+        """
+        Standard error of the mean estimated at each blocking level.
+        """
+        errors = []
+        for c, s, s2 in zip(self.count, self.sum, self.sum2):
+            if c < 2:
+                break
+            var = max(s2 / c - (s / c) ** 2, 0.0)
+            errors.append(math.sqrt(var / (c - 1)))
+        return errors
+
+    def error(self, min_blocks=32):
+        """
+        Binning estimate of the standard error of the mean.
+
+        The naive error grows with block size until blocks are longer than
+        the correlation time; the largest value over levels that still have
+        at least min_blocks blocks is returned.
+        """
+        errors = self.level_errors()
+        usable = [e for e, c in zip(errors, self.count) if c >= min_blocks]
+        if usable:
+            return max(usable)
+        return errors[0] if errors else math.nan
+
+class MCAccumulator:
+    """
+    Streaming version of analyze_mc_trajectory.
+
+    Pass it as the sink of MC.run_mc; it keeps running sums only,
+    so a run of any length uses constant memory.
+
+    Besides the frame count, <E>, <R_ee> and the macrostates, results()
+    gives <E^2>, <Rg>, Cv (when Beta is given) and binning standard errors
+    of the energy, end-to-end distance and Rg averages.
+    """
+
+    def __init__(self, Beta=None):
+        self.Beta = Beta
+        self.n_frames = 0
+        self.sum_end2end = 0
+        self.sum_energy = 0
+        self.sum_energy2 = 0
+        self.macro = Counter()
+        self.energy_bins = BinningAccumulator()
+        self.end2end_bins = BinningAccumulator()
+        self.rg_bins = BinningAccumulator()
+
+    def __call__(self, step, path, energy):
+        self.add(energy, end_to_end(path), radius_of_gyration(path))
+
+    def add(self, energy, r, rg):
+        """
+        Add one frame given its energy, end-to-end distance and Rg.
+        """
+        self.n_frames += 1
+        self.sum_end2end += r
+        self.sum_energy += energy
+        self.sum_energy2 += energy * energy
+        self.macro[energy] += 1
+
+        self.energy_bins.add(energy)
+        self.end2end_bins.add(r)
+        self.rg_bins.add(rg)
+
+    def checkpoint_state(self):
+        return dict(self.__dict__)
+
+    def restore_state(self, state):
+        self.__dict__.update(state)
+
+    def results(self):
+        avg_energy = self.sum_energy / self.n_frames
+        avg_energy2 = self.sum_energy2 / self.n_frames
+
+        if self.Beta is None:
+            Cv = None
+        else:
+            Cv = self.Beta ** 2 * (avg_energy2 - avg_energy ** 2)
+
+        return {
+            "n_frames": self.n_frames,
+            "avg_end2end": self.sum_end2end / self.n_frames,
+            "avg_energy": avg_energy,
+            "macrostates": self.macro,
+            "avg_energy2": avg_energy2,
+            "avg_rg": self.rg_bins.mean(),
+            "Cv": Cv,
+            "err_energy": self.energy_bins.error(),
+            "err_end2end": self.end2end_bins.error(),
+            "err_rg": self.rg_bins.error()
+        }
+
+def load_trajectory(filename):
+    """
+    Open an MC trajectory in either format.
+
+    Binary files (.hptraj) are memory-mapped and returned as a
+    BinaryTrajectory together with its energy column; anything else
+    is parsed as text with read_trajectory.
+    """
+    if filename.endswith(".hptraj"):
+        traj = BinaryTrajectory(filename)
+        return traj, traj.energies
+
+    return read_trajectory(filename)
+
 def analyze_mc_trajectory(trajectory, energies):
     """
     Compute simple averages from a Monte Carlo trajectory.
+
+    trajectory may also be a BinaryTrajectory, in which case Rg and the
+    end-to-end distances are computed from the memory-mapped bonds by
+    batch_properties. Both give the keys of MCAccumulator.results.
     """
-    sum_end2end = 0
-    for path in trajectory:
-        sum_end2end += end_to_end(path)
+    acc = MCAccumulator()
 
-    avg_end2end = sum_end2end / len(trajectory)
-    avg_energy = sum(energies) / len(energies)
+    if isinstance(trajectory, BinaryTrajectory):
+        props = batch_properties(trajectory.bonds, "P" * trajectory.n_beads, 0)
+        for energy, r, rg in zip(np.asarray(energies).tolist(), props["end2end"].tolist(),
+                                 props["rg"].tolist()):
+            acc.add(energy, r, rg)
+        return acc.results()
 
-    macro = Counter(energies)
+    for step, (path, energy) in enumerate(zip(trajectory, energies)):
+        acc(step, path, energy)
 
-    results = {
-        "n_frames": len(trajectory),
-        "avg_end2end": avg_end2end,
-        "avg_energy": avg_energy,
-        "macrostates": macro
-    }
-
-    return results
+    return acc.results()
@@ -3,8 +3,9 @@ import sys
 kT = 0.6
 Epsilon = 1
 
-from analysis import read_trajectory, analyze_mc_trajectory, analyze_paths
-from enumeration import enumerate_paths
+from analysis import load_trajectory, analyze_mc_trajectory, analyze_histogram
+from binary_trajectory import BinaryTrajectory
+from contact_cache import load_walk_cache
 
 def canonical(path):
     """
@@ -20,14 +21,21 @@ def first_coverage_step(sequence, trajectory):
     Find the first MC step where all exact enumerated states
     have been sampled at least once.
     """
-    exact_paths = enumerate_paths(sequence)
-    exact_set = set(canonical(path) for path in exact_paths)
+    cache = load_walk_cache(len(sequence))
+
+    if isinstance(trajectory, BinaryTrajectory):
+        # Packed bond directions do not depend on translation,
+        # so they serve as the canonical state without decoding
+        exact_set = set(bonds.tobytes() for bonds in cache.bonds)
+        states = (bonds.tobytes() for bonds in trajectory.bonds)
+    else:
+        exact_set = set(canonical(path) for path in cache.paths())
+        states = (canonical(path) for path in trajectory)
 
     visited = set()
     coverage_step = None
 
-    for step, path in enumerate(trajectory):
-        state = canonical(path)
+    for step, state in enumerate(states):
 
         if state in exact_set:
             visited.add(state)
@@ -49,8 +57,8 @@ if __name__ == "__main__":
     print("Sequence:", sequence)
     print("Trajectory file:", trajectory_file)
 
-    # Read MC trajectory
-    trajectory, energies = read_trajectory(trajectory_file)
+    # Read MC trajectory (text, or binary .hptraj)
+    trajectory, energies = load_trajectory(trajectory_file)
 
     # ----- MC sampled results -----
     mc_results = analyze_mc_trajectory(trajectory, energies)
@@ -62,8 +70,8 @@ if __name__ == "__main__":
     print("Sampled macrostates:", mc_results["macrostates"])
 
     # ----- Exact enumeration results -----
-    possible_paths = enumerate_paths(sequence)
-    exact_results = analyze_paths(possible_paths, sequence, kT, Epsilon)
+    cache = load_walk_cache(len(sequence))
+    exact_results = analyze_histogram(cache.histogram(sequence, Epsilon), kT)
 
     print("\nExact enumeration results")
     print("Number of exact paths:", exact_results["n_paths"])
@@ -0,0 +1,171 @@
+import sys
+
+import numpy as np
+
+from analysis import batch_properties, load_trajectory
+from binary_trajectory import BinaryTrajectory
+
+"""
+Autocorrelation analysis of Monte Carlo time series.
+
+The normalized autocorrelation function is computed with an FFT in
+O(N log N). The integrated autocorrelation time
+    tau = 1 + 2 sum_{t=1}^{M} rho(t)
+is cut off with Sokal's automatic window (smallest M with M >= c * tau(M)),
+so the effective number of independent samples is N / tau.
+"""
+
+def autocorrelation(x):
+    """
+    Normalized autocorrelation function rho(t) of a 1D series.
+    """
+    x = np.asarray(x, dtype=float)
+    n = len(x)
+    dx = x - x.mean()
+
+    # Zero-pad to a power of two >= 2n so the circular correlation is linear
+    size = 1 << (2 * n - 1).bit_length()
+    f = np.fft.rfft(dx, size)
+    acf = np.fft.irfft(f * np.conjugate(f), size)[:n]
+
+    if acf[0] == 0:
+        # A constant series carries no correlation information
+        rho = np.zeros(n)
+        rho[0] = 1.0
+        return rho
+
+    return acf / acf[0]
+
+def integrated_time(x, c=5.0):
+    """
+    Integrated autocorrelation time with Sokal's automatic window.
+
+    Returns
+    -------
+    tau : float
+        Integrated autocorrelation time in frames (1 for uncorrelated data)
+    window : int
+        Summation window M that was used
+    """
+    rho = autocorrelation(x)
+    taus = 2.0 * np.cumsum(rho) - 1.0
+
+    windows = np.arange(len(taus))
+    ok = windows >= c * taus
+    if ok.any():
+        window = int(np.argmax(ok))
+    else:
+        # Series too short for the window rule; the estimate is unreliable
+        window = len(taus) - 1
+
+    return float(taus[window]), window
+
+def effective_sample_size(x, c=5.0):
+    """
+    Number of effectively independent samples, N / tau.
+    """
+    tau, _ = integrated_time(x, c)
+    return len(x) / tau
+
+def frames_for_error(x, target_error, c=5.0):
+    """
+    Number of frames needed to reach target_error on the mean of x,
+    from its variance and integrated autocorrelation time.
+    """
+    tau, _ = integrated_time(x, c)
+    var = np.var(x)
+    return int(np.ceil(tau * var / target_error ** 2))
+
+def trajectory_series(trajectory, energies):
+    """
+    Energy, Rg and end-to-end distance series of a trajectory.
+
+    trajectory may be a list of paths (read_trajectory, run_mc) or a
+    BinaryTrajectory, whose packed bonds are decoded in chunks. Rg and the
+    end-to-end distance come from analysis.batch_properties.
+    """
+    energies = np.asarray(energies, dtype=float)
+
+    if isinstance(trajectory, BinaryTrajectory):
+        props = batch_properties(trajectory.bonds, "P" * trajectory.n_beads, 0)
+    else:
+        props = batch_properties(trajectory, "P" * len(trajectory[0]), 0)
+
+    return {"energy": energies, "rg": props["rg"], "end2end": props["end2end"]}
+
+def analyze_series(series, runtime=None, stride=1, target_error=None, c=5.0):
+    """
+    Autocorrelation summary for each named series.
+
+    Parameters
+    ----------
+    series : dict
+        Name -> 1D array, e.g. from trajectory_series, or
+        {"energy": energies} for the list returned by run_mc
+    runtime : float or None
+        Wall-clock seconds the run took, for ESS per second
+    stride : int
+        MC steps between frames, to express tau in steps
+    target_error : float or None
+        If given, also report the MC steps needed for this error on the mean
+
+    Returns
+    -------
+    results : dict
+        Name -> dict with tau (frames), tau_steps, window, ess,
+        ess_per_second, mean, error, and steps_for_target if requested.
+    """
+    results = {}
+
+    for name, x in series.items():
+        x = np.asarray(x, dtype=float)
+        tau, window = integrated_time(x, c)
+        ess = len(x) / tau
+
+        summary = {
+            "tau": tau,
+            "tau_steps": tau * stride,
+            "window": window,
+            "ess": ess,
+            "ess_per_second": ess / runtime if runtime else None,
+            "mean": float(x.mean()),
+            "error": float(np.sqrt(np.var(x) / ess))
+        }
+
+        if target_error is not None:
+            summary["steps_for_target"] = frames_for_error(x, target_error, c) * stride
+
+        results[name] = summary
+
+    return results
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 autocorrelation.py <trajectory_file> [runtime_seconds] [target_error]")
+        sys.exit()
+
+    trajectory_file = sys.argv[1]
+    runtime = float(sys.argv[2]) if len(sys.argv) > 2 else None
+    target_error = float(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    trajectory, energies = load_trajectory(trajectory_file)
+
+    if isinstance(trajectory, BinaryTrajectory) and len(trajectory) > 1:
+        stride = int(trajectory.steps[1] - trajectory.steps[0])
+    else:
+        stride = 1
+
+    results = analyze_series(trajectory_series(trajectory, energies), runtime, stride, target_error)
+
+    print("Trajectory file:", trajectory_file)
+    print("Frames:", len(energies))
+    for name, summary in results.items():
+        print()
+        print(name)
+        print("  mean =", summary["mean"], "+/-", summary["error"])
+        print("  tau_int (frames) =", summary["tau"], " window =", summary["window"])
+        print("  effective sample size =", summary["ess"])
+        if summary["ess_per_second"] is not None:
+            print("  ESS per second =", summary["ess_per_second"])
+        if "steps_for_target" in summary:
+            print("  steps for target error =", summary["steps_for_target"])
@@ -0,0 +1,265 @@
+import sys
+
+import numpy as np
+
+"""
+Vectorized Monte Carlo for many independent HP chains at once.
+
+K chains of the same length are stored as one (K, n, 2) integer array.
+Every step proposes one reptation move per chain, checks overlaps and
+scores the contacts gained and lost at the moved ends for all chains
+with array operations (O(n) per chain), and applies the Metropolis
+test with a vector of random numbers. Chains may differ in
+sequence and inverse temperature.
+"""
+
+# Same directions as the moves table in MC.py: R, L, U, D
+move_vectors = np.array([(1, 0), (-1, 0), (0, 1), (0, -1)], dtype=np.int64)
+
+def straight_paths(n_chains, n_beads):
+    """
+    K copies of the straight conformation along x, as a (K, n, 2) array.
+    """
+    coords = np.zeros((n_chains, n_beads, 2), dtype=np.int64)
+    coords[:, :, 0] = np.arange(n_beads)
+    return coords
+
+def hh_pair_masks(sequences):
+    """
+    Boolean (K, n, n) mask of bead pairs (i, j) with j >= i + 2 that are both H.
+
+    These are the only pairs that can contribute to the HP energy.
+    """
+    is_h = np.array([[c == "H" for c in seq] for seq in sequences])
+    n = is_h.shape[1]
+    nonbonded = np.triu(np.ones((n, n), dtype=bool), k=2)
+    return is_h[:, :, None] & is_h[:, None, :] & nonbonded
+
+def batch_energies(coords, pair_masks, Epsilon):
+    """
+    HP energy of every chain, as analysis.hp_contacts would give it.
+    """
+    diff = np.abs(coords[:, :, None, :] - coords[:, None, :, :]).sum(axis=-1)
+    n_contacts = ((diff == 1) & pair_masks).sum(axis=(1, 2))
+    return -Epsilon * n_contacts
+
+def contact_partners(coords):
+    """
+    Nonbonded lattice neighbours of every bead, as a (K, n, 3) index array.
+
+    A bead has at most three nonbonded neighbours (two inside the chain),
+    so three slots per bead hold them; unused slots contain n.
+    """
+    n_chains, n, _ = coords.shape
+    idx = np.arange(n)
+    diff = np.abs(coords[:, :, None, :] - coords[:, None, :, :]).sum(axis=-1)
+    touching = (diff == 1) & (np.abs(idx[:, None] - idx[None, :]) >= 2)
+
+    partners = np.full((n_chains, n, 3), n, dtype=np.int64)
+    c, a, b = np.nonzero(touching)
+    rank = (np.cumsum(touching, axis=2) - 1)[c, a, b]
+    partners[c, a, rank] = b
+    return partners
+
+def shifted_h(sequences):
+    """
+    H masks of the beads relabelled by a reptation move, padded with a 0 at n.
+
+    After a move to the front, old bead k becomes bead k + 1, so its type
+    is sequence[k + 1]; the removed last bead gets 0. A move to the back
+    shifts the other way.
+
+    Returns
+    -------
+    front, back : (K, n + 1) int arrays
+    """
+    is_h = np.array([[c == "H" for c in seq] for seq in sequences], dtype=np.int64)
+    n_chains, n = is_h.shape
+
+    front = np.zeros((n_chains, n + 1), dtype=np.int64)
+    back = np.zeros((n_chains, n + 1), dtype=np.int64)
+    front[:, :n - 1] = is_h[:, 1:]
+    back[:, 1:n] = is_h[:, :n - 1]
+    return front, back
+
+def batch_reptation_step(coords, contacts, partners, h_front, h_back, Betas, Epsilon, rng):
+    """
+    One reptation move with Metropolis acceptance for every chain.
+
+    A reptation move shifts every bead along the sequence, so the spatial
+    contacts stay the same except at the two ends but may change type.
+    The trial energy is scored from the contact partner table (O(n) per
+    chain) plus the contacts of the new end bead, found by comparing its
+    position with every bead. coords, contacts (H-H contact counts) and
+    partners are updated in place.
+
+    Returns
+    -------
+    accepted : (K,) bool array
+        True where the move was accepted.
+    valid : (K,) bool array
+        True where the proposal was self-avoiding.
+    """
+    n_chains, n, _ = coords.shape
+
+    to_front = rng.random(n_chains) < 0.5
+    steps = move_vectors[rng.integers(0, 4, n_chains)]
+
+    front = to_front[:, None]
+    growth_end = np.where(front, coords[:, 0], coords[:, -1])
+    new_position = growth_end + steps
+    d_new = np.abs(coords - new_position[:, None, :]).sum(axis=-1)
+
+    # The vacated end site may be reused, every other site is occupied
+    occupied = d_new == 0
+    occupied[:, -1] &= ~to_front
+    occupied[:, 0] &= to_front
+    valid = ~occupied.any(axis=1)
+
+    # Kept contacts under the new labels; the removed end has type 0
+    h = np.where(front, h_front, h_back)
+    h_partners = np.take_along_axis(h, partners.reshape(n_chains, -1), axis=1).reshape(n_chains, n, 3)
+    kept = (h[:, :n, None] * h_partners).sum(axis=(1, 2)) // 2
+
+    # New end bead (sequence[0] or sequence[-1]) against old beads 1..n-2,
+    # which excludes its bonded neighbour and the removed end
+    touching = d_new == 1
+    touching[:, 0] = False
+    touching[:, -1] = False
+    new_is_h = np.where(to_front, h_back[:, 1], h_front[:, n - 2])
+    gained = new_is_h * (touching * h[:, :n]).sum(axis=1)
+
+    trial = kept + gained
+    deltaE = -Epsilon * (trial - contacts)
+
+    with np.errstate(over="ignore"):
+        boltzmann = np.exp(-Betas * np.maximum(deltaE, 0))
+    accepted = valid & ((deltaE <= 0) | (rng.random(n_chains) < boltzmann))
+
+    to_head = accepted & to_front
+    to_tail = accepted & ~to_front
+
+    coords[to_head, 1:] = coords[to_head, :-1]
+    coords[to_head, 0] = new_position[to_head]
+    coords[to_tail, :-1] = coords[to_tail, 1:]
+    coords[to_tail, -1] = new_position[to_tail]
+    contacts[accepted] = trial[accepted]
+
+    p = partners[to_head]
+    p[p == n - 1] = n
+    p = np.where(p < n, p + 1, n)
+    p[:, 1:] = p[:, :-1].copy()
+    p[:, 0] = n
+    partners[to_head] = p
+
+    p = partners[to_tail]
+    p[p == 0] = n
+    p = np.where(p < n, p - 1, n)
+    p[:, :-1] = p[:, 1:].copy()
+    p[:, -1] = n
+    partners[to_tail] = p
+
+    # Link the new end bead with the beads it touches
+    touching &= accepted[:, None]
+    c, k = np.nonzero(touching)
+    rank = (np.cumsum(touching, axis=1) - 1)[c, k]
+    end = np.where(to_front[c], 0, n - 1)
+    other = np.where(to_front[c], k + 1, k - 1)
+    partners[c, end, rank] = other
+    free = np.argmax(partners[c, other] == n, axis=1)
+    partners[c, other, free] = end
+
+    return accepted, valid
+
+def run_batch_mc(sequences, initial_coords, n_steps, Betas, Epsilon, seed=None, sink=None, stride=1):
+    """
+    Run K independent reptation Monte Carlo chains in lockstep.
+
+    Parameters
+    ----------
+    sequences : str or list of str
+        One HP sequence for all chains, or one per chain (same length)
+    initial_coords : (K, n, 2) array
+        Starting conformations, e.g. from straight_paths
+    n_steps : int
+        Number of Monte Carlo steps per chain
+    Betas : float or (K,) array
+        Inverse temperature of each chain
+    Epsilon : float
+        H-H contact strength
+    seed : int or None
+        Seed of the numpy random generator driving all chains
+    sink : callable or None
+        Receives sink(step, coords, energies) for the initial state and
+        every stride-th step. The arrays are live views; copy to keep them.
+    stride : int
+        Interval between frames passed to sink
+
+    Returns
+    -------
+    coords : (K, n, 2) array
+        Final conformations
+    energies : (K,) array
+        Final energies
+    accepted_moves : (K,) array
+        Number of accepted moves per chain
+    invalid_moves : (K,) array
+        Number of invalid proposals per chain
+    """
+    coords = np.array(initial_coords, dtype=np.int64)
+    n_chains = len(coords)
+
+    if isinstance(sequences, str):
+        sequences = [sequences] * n_chains
+    h_front, h_back = shifted_h(sequences)
+    Betas = np.broadcast_to(np.asarray(Betas, dtype=float), (n_chains,))
+    rng = np.random.default_rng(seed)
+
+    contacts = batch_energies(coords, hh_pair_masks(sequences), -1).astype(np.int64)
+    partners = contact_partners(coords)
+    energies = -Epsilon * contacts.astype(float)
+
+    accepted_moves = np.zeros(n_chains, dtype=np.int64)
+    invalid_moves = np.zeros(n_chains, dtype=np.int64)
+
+    if sink is not None:
+        sink(0, coords, energies)
+
+    for step in range(1, n_steps + 1):
+        accepted, valid = batch_reptation_step(coords, contacts, partners, h_front, h_back,
+                                               Betas, Epsilon, rng)
+        energies[accepted] = -Epsilon * contacts[accepted]
+        accepted_moves += accepted
+        invalid_moves += ~valid
+
+        if sink is not None and step % stride == 0:
+            sink(step, coords, energies)
+
+    return coords, energies, accepted_moves, invalid_moves
+
+def to_paths(coords):
+    """
+    Convert a (K, n, 2) array into K paths of (x, y) tuples.
+    """
+    return [[tuple(site) for site in chain] for chain in coords.tolist()]
+
+if __name__ == "__main__":
+    #If this script is the driver then execute the following
+    Beta = 10.0 / 6.0
+    Epsilon = 1
+
+    sequence = sys.argv[1]
+    n_steps = int(sys.argv[2])
+    n_chains = int(sys.argv[3])
+
+    initial = straight_paths(n_chains, len(sequence))
+    coords, energies, accepted_moves, invalid_moves = run_batch_mc(
+        sequence, initial, n_steps, Beta, Epsilon
+    )
+
+    print("Sequence:", sequence)
+    print("Chains:", n_chains)
+    print("Mean final energy:", energies.mean())
+    print("Lowest final energy:", energies.min())
+    print("Mean acceptance ratio:", accepted_moves.mean() / n_steps)
+    print("Mean invalid ratio:", invalid_moves.mean() / n_steps)
@@ -0,0 +1,362 @@
+import json
+import math
+import platform
+import random
+import statistics
+import sys
+import timeit
+import tracemalloc
+
+import analysis
+import batch_mc
+import enumeration
+import MC
+import restrained_analysis
+
+"""
+Reproducible performance benchmarks for the HP lattice code.
+
+Times exact enumeration, energy evaluation, the exact analysis routines
+and MC throughput (single chain and batch_mc) over a range of chain
+lengths and over the six sequences in results/. Each measurement records
+the median wall time per call of several repeats, the same time relative
+to a reference loop run between the repeats, and the peak traced memory
+of one extra run. Scaling is summarized by a fitted exponent: time ~ n^p
+for the polynomial routines, and time ~ b^n (growth per bead) for
+enumeration-based ones.
+
+Results are written to JSON; pass a saved baseline to flag slowdowns.
+"""
+
+Epsilon = 1
+kT = 0.6
+Beta = 1.0 / kT
+
+results_sequences = ["HHHHHHHH", "HHPPHPPH", "HPHPPHHP", "HPPHPHPH", "PHHPPHPH", "PPPPPPPP"]
+
+def sequence_of_length(n):
+    """
+    A fixed HP pattern cut to length n, so every run uses the same chains.
+    """
+    return ("HHPPHPPH" * (n // 8 + 1))[:n]
+
+def reference_loop():
+    """
+    Fixed pure-Python workload timed alongside every measurement.
+    """
+    total = 0
+    for i in range(20000):
+        total += i * i % 7
+    return total
+
+def calibrated_number(timer, min_time):
+    """
+    Calls per repeat so that one repeat takes at least min_time, as in
+    timeit.Timer.autorange.
+    """
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+    return number
+
+def measure(function, repeats=10, min_time=0.02):
+    """
+    Time function per call over repeats, and the peak memory of one traced call.
+
+    Every repeat calls function enough times to take at least min_time,
+    right after a run of reference_loop. The ratio of the two cancels
+    out how busy the machine was at that moment, so it is what
+    compare() uses.
+
+    Returns a dict with seconds (median), best_seconds, relative (median
+    time in units of reference_loop) and peak_bytes.
+    """
+    timer = timeit.Timer(function)
+    reference = timeit.Timer(reference_loop)
+    number = calibrated_number(timer, min_time)
+    reference_number = calibrated_number(reference, min_time)
+
+    times = []
+    ratios = []
+    for _ in range(repeats):
+        t_reference = reference.timeit(reference_number) / reference_number
+        t = timer.timeit(number) / number
+        times.append(t)
+        ratios.append(t / t_reference)
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "seconds": statistics.median(times),
+        "best_seconds": min(times),
+        "relative": statistics.median(ratios),
+        "peak_bytes": peak
+    }
+
+def fit_slope(xs, ys):
+    """
+    Least-squares slope of ys against xs.
+    """
+    n = len(xs)
+    mx = sum(xs) / n
+    my = sum(ys) / n
+    sxx = sum((x - mx) ** 2 for x in xs)
+    sxy = sum((x - mx) * (y - my) for x, y in zip(xs, ys))
+    return sxy / sxx if sxx else math.nan
+
+def power_exponent(lengths, times):
+    """
+    p in time ~ n^p.
+    """
+    pairs = [(math.log(n), math.log(t)) for n, t in zip(lengths, times) if t > 0]
+    return fit_slope([x for x, _ in pairs], [y for _, y in pairs])
+
+def growth_per_bead(lengths, times):
+    """
+    b in time ~ b^n.
+    """
+    pairs = [(n, math.log(t)) for n, t in zip(lengths, times) if t > 0]
+    return math.exp(fit_slope([x for x, _ in pairs], [y for _, y in pairs]))
+
+def random_walk_path(n, seed=0):
+    """
+    A reproducible self-avoiding conformation of n beads from a short MC run.
+    """
+    sequence = "P" * n
+    trajectory, _, _, _ = MC.run_mc(sequence, MC.straight_path(sequence), 20 * n, Beta, Epsilon,
+                                    stride=20 * n, rng=random.Random(seed))
+    return trajectory[-1]
+
+def benchmark_lengths(enum_lengths, mc_lengths, mc_steps, repeats, batch_chains=64):
+    """
+    Time every routine across chain lengths.
+    """
+    rows = {
+        "enumerate_paths": [],
+        "analyze_paths": [],
+        "analyze_paths_with_restraint": [],
+        "hp_contacts": [],
+        "run_mc": [],
+        "batch_mc": []
+    }
+
+    for n in enum_lengths:
+        sequence = sequence_of_length(n)
+        paths = enumeration.enumerate_paths(sequence)
+
+        m = measure(lambda: enumeration.enumerate_paths(sequence), repeats)
+        rows["enumerate_paths"].append({"n": n, **m, "n_paths": len(paths)})
+
+        m = measure(lambda: analysis.analyze_paths(paths, sequence, kT, Epsilon), repeats)
+        rows["analyze_paths"].append({"n": n, **m, "n_paths": len(paths)})
+
+        m = measure(lambda: restrained_analysis.analyze_paths_with_restraint(
+            paths, sequence, kT, Epsilon, 0, n - 1, 1.0), repeats)
+        rows["analyze_paths_with_restraint"].append({"n": n, **m, "n_paths": len(paths)})
+
+    for n in mc_lengths:
+        sequence = sequence_of_length(n)
+        path = random_walk_path(n)
+        calls = 1000
+
+        def many_contacts():
+            for _ in range(calls):
+                analysis.hp_contacts(path, sequence, Epsilon)
+
+        m = measure(many_contacts, repeats)
+        rows["hp_contacts"].append({"n": n, "seconds": m["seconds"] / calls, "best_seconds": m["best_seconds"] / calls,
+                                    "relative": m["relative"] / calls, "peak_bytes": m["peak_bytes"]})
+
+        def mc_run():
+            MC.run_mc(sequence, MC.straight_path(sequence), mc_steps, Beta, Epsilon,
+                      sink=lambda step, p, e: None, rng=random.Random(0))
+
+        m = measure(mc_run, repeats)
+        rows["run_mc"].append({"n": n, **m, "steps_per_second": mc_steps / m["seconds"]})
+
+        # batch_mc against run_mc in chain-steps per second, same total work x 10
+        batch_steps = 10 * mc_steps // batch_chains
+
+        def batch_run():
+            batch_mc.run_batch_mc(sequence, batch_mc.straight_paths(batch_chains, n), batch_steps,
+                                  Beta, Epsilon, seed=0)
+
+        m = measure(batch_run, repeats)
+        chain_steps_per_second = batch_chains * batch_steps / m["seconds"]
+        rows["batch_mc"].append({
+            "n": n,
+            **m,
+            "chains": batch_chains,
+            "chain_steps_per_second": chain_steps_per_second,
+            "speedup_vs_run_mc": chain_steps_per_second / rows["run_mc"][-1]["steps_per_second"]
+        })
+
+    scaling = {
+        "enumerate_paths_growth_per_bead": growth_per_bead(
+            [r["n"] for r in rows["enumerate_paths"]], [r["seconds"] for r in rows["enumerate_paths"]]),
+        "analyze_paths_growth_per_bead": growth_per_bead(
+            [r["n"] for r in rows["analyze_paths"]], [r["seconds"] for r in rows["analyze_paths"]]),
+        "analyze_paths_with_restraint_growth_per_bead": growth_per_bead(
+            [r["n"] for r in rows["analyze_paths_with_restraint"]],
+            [r["seconds"] for r in rows["analyze_paths_with_restraint"]]),
+        "hp_contacts_exponent": power_exponent(
+            [r["n"] for r in rows["hp_contacts"]], [r["seconds"] for r in rows["hp_contacts"]]),
+        "run_mc_exponent": power_exponent(
+            [r["n"] for r in rows["run_mc"]], [r["seconds"] for r in rows["run_mc"]]),
+        "batch_mc_exponent": power_exponent(
+            [r["n"] for r in rows["batch_mc"]], [r["seconds"] for r in rows["batch_mc"]])
+    }
+
+    return rows, scaling
+
+def benchmark_sequences(mc_steps, repeats):
+    """
+    Enumeration + analysis and MC throughput for the sequences in results/.
+    """
+    rows = []
+    for sequence in results_sequences:
+        paths = enumeration.enumerate_paths(sequence)
+        m_enum = measure(lambda: enumeration.enumerate_paths(sequence), repeats)
+        m_analysis = measure(lambda: analysis.analyze_paths(paths, sequence, kT, Epsilon), repeats)
+
+        def mc_run():
+            MC.run_mc(sequence, MC.straight_path(sequence), mc_steps, Beta, Epsilon,
+                      sink=lambda step, p, e: None, rng=random.Random(0))
+
+        m_mc = measure(mc_run, repeats)
+        rows.append({
+            "sequence": sequence,
+            "enumerate_seconds": m_enum["seconds"],
+            "enumerate_relative": m_enum["relative"],
+            "analyze_seconds": m_analysis["seconds"],
+            "analyze_relative": m_analysis["relative"],
+            "mc_seconds": m_mc["seconds"],
+            "mc_relative": m_mc["relative"],
+            "mc_steps_per_second": mc_steps / m_mc["seconds"],
+            "mc_peak_bytes": m_mc["peak_bytes"]
+        })
+    return rows
+
+def run_benchmarks(quick=False):
+    """
+    Run the whole suite and return a JSON-serializable dict.
+    """
+    if quick:
+        enum_lengths = [6, 7, 8, 9, 10]
+        mc_lengths = [8, 16, 32]
+        mc_steps = 5000
+        repeats = 10
+    else:
+        enum_lengths = [6, 7, 8, 9, 10, 11, 12]
+        mc_lengths = [8, 16, 32, 64, 128]
+        mc_steps = 50000
+        repeats = 10
+
+    by_length, scaling = benchmark_lengths(enum_lengths, mc_lengths, mc_steps, repeats)
+
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "quick": quick,
+        "mc_steps": mc_steps,
+        "by_length": by_length,
+        "by_sequence": benchmark_sequences(mc_steps, repeats),
+        "scaling": scaling
+    }
+
+def compare(current, baseline, tolerance=0.5, min_seconds=0.01):
+    """
+    List measurements that got slower than baseline by more than tolerance.
+
+    Measurements are compared by their time relative to reference_loop,
+    so a machine that is busier than when the baseline was recorded does
+    not fail the check. Even so, repeated runs of unchanged code on a
+    shared machine differ by up to about 40%, hence the default tolerance. Timings below min_seconds in both runs are
+    skipped (hp_contacts is stored per call,
+    so it is always kept). A baseline recorded in the other (quick or
+    full) mode is not comparable and gives None.
+
+    Returns a list of (name, baseline_seconds, current_seconds) tuples,
+    or None.
+    """
+    if baseline.get("quick") != current["quick"] or baseline.get("mc_steps") != current["mc_steps"]:
+        return None
+
+    slower = []
+
+    def check(name, ref, row, key, relative_key, floor=min_seconds):
+        old, new = ref[key], row[key]
+        if relative_key not in ref:
+            return
+        if max(old, new) >= floor and row[relative_key] > (1 + tolerance) * ref[relative_key]:
+            slower.append((name, old, new))
+
+    for name, rows in current["by_length"].items():
+        old = {r["n"]: r for r in baseline.get("by_length", {}).get(name, [])}
+        floor = 0.0 if name == "hp_contacts" else min_seconds
+        for row in rows:
+            ref = old.get(row["n"])
+            if ref:
+                check(f"{name} n={row['n']}", ref, row, "seconds", "relative", floor)
+
+    old = {r["sequence"]: r for r in baseline.get("by_sequence", [])}
+    for row in current["by_sequence"]:
+        ref = old.get(row["sequence"])
+        if not ref:
+            continue
+        for key in ["enumerate", "analyze", "mc"]:
+            check(f"{key}_seconds {row['sequence']}", ref, row, f"{key}_seconds", f"{key}_relative")
+
+    return slower
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 benchmark.py <output.json> [baseline.json] [quick]")
+        sys.exit()
+
+    output_file = sys.argv[1]
+    baseline_file = sys.argv[2] if len(sys.argv) > 2 and sys.argv[2] != "quick" else None
+    quick = "quick" in sys.argv[2:]
+
+    current = run_benchmarks(quick)
+
+    with open(output_file, "w") as f:
+        json.dump(current, f, indent=2)
+
+    print("Benchmark results written to", output_file)
+    print()
+    for name, rows in current["by_length"].items():
+        print(name)
+        for row in rows:
+            print("  n =", row["n"], "  seconds =", row["seconds"], "  peak MB =", row["peak_bytes"] / 1e6)
+    print()
+    print("batch_mc vs run_mc")
+    for row in current["by_length"]["batch_mc"]:
+        print("  n =", row["n"], "  chain-steps/s =", row["chain_steps_per_second"],
+              "  speedup =", row["speedup_vs_run_mc"])
+    print()
+    print("Scaling")
+    for name, value in current["scaling"].items():
+        print(" ", name, "=", value)
+    print()
+    print("Sequence    MC steps/s    enumerate s    analyze s")
+    for row in current["by_sequence"]:
+        print(row["sequence"], "   ", row["mc_steps_per_second"], "   ", row["enumerate_seconds"], "   ", row["analyze_seconds"])
+
+    if baseline_file:
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+        slower = compare(current, baseline)
+        print()
+        if slower is None:
+            print("Baseline", baseline_file, "was recorded in another mode; comparison skipped")
+            sys.exit()
+        if slower:
+            print("SLOWER than baseline:")
+            for name, old, new in slower:
+                print(f"  {name}: {old:.4g} s -> {new:.4g} s")
+            sys.exit(1)
+        print("No slowdowns against", baseline_file)
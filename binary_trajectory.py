@@ -0,0 +1,257 @@
+import os
+import struct
+import sys
+
+import numpy as np
+
+"""
+Compact binary trajectory format for HP lattice chains.
+
+A conformation is stored as the position of its first bead plus one
+2-bit move direction per bond, packed four bonds to a byte.
+
+File layout (little endian):
+    header : magic "HPTRAJ01" | n_beads (uint32) | reserved (uint32)
+    record : step (int64) | energy (float64) | x0, y0 (int32) | packed bonds
+
+Records have a fixed size, so the file is read with numpy.memmap and any
+frame can be reached without parsing the ones before it.
+"""
+
+MAGIC = b"HPTRAJ01"
+HEADER = struct.Struct("<8sII")
+RECORD_HEAD = struct.Struct("<qdii")
+
+# 2-bit codes, in the same order as the moves table in MC.py
+directions = {
+    (1, 0): 0,   # R
+    (-1, 0): 1,  # L
+    (0, 1): 2,   # U
+    (0, -1): 3   # D
+}
+direction_vectors = np.array([(1, 0), (-1, 0), (0, 1), (0, -1)], dtype=np.int32)
+
+def packed_size(n_beads):
+    """
+    Number of bytes needed for the bonds of an n-bead chain.
+    """
+    return (max(n_beads - 1, 0) + 3) // 4
+
+def record_dtype(n_beads):
+    return np.dtype([
+        ("step", "<i8"),
+        ("energy", "<f8"),
+        ("origin", "<i4", (2,)),
+        ("bonds", "u1", (packed_size(n_beads),))
+    ])
+
+def encode_path(path):
+    """
+    Pack the bond directions of a path into bytes, 2 bits per bond.
+    """
+    packed = bytearray(packed_size(len(path)))
+    for k in range(len(path) - 1):
+        step = (path[k + 1][0] - path[k][0], path[k + 1][1] - path[k][1])
+        packed[k // 4] |= directions[step] << (2 * (k % 4))
+    return bytes(packed)
+
+def decode_bonds(packed, n_beads):
+    """
+    Unpack bond codes for many conformations at once.
+
+    packed : (N, packed_size) uint8 array
+    Returns an (N, n_beads - 1) array of codes 0..3.
+    """
+    packed = np.asarray(packed, dtype=np.uint8)
+    shifts = np.array([0, 2, 4, 6], dtype=np.uint8)
+    codes = (packed[:, :, None] >> shifts) & 3
+    return codes.reshape(len(packed), -1)[:, :n_beads - 1]
+
+def decode_coordinates(origins, packed, n_beads):
+    """
+    Rebuild bead coordinates from first-bead positions and packed bonds.
+
+    Returns an (N, n_beads, 2) int32 array.
+    """
+    origins = np.asarray(origins, dtype=np.int32)
+    coords = np.empty((len(origins), n_beads, 2), dtype=np.int32)
+    coords[:, 0] = origins
+    if n_beads > 1:
+        steps = direction_vectors[decode_bonds(packed, n_beads)]
+        coords[:, 1:] = origins[:, None, :] + np.cumsum(steps, axis=1)
+    return coords
+
+class BinaryTrajectoryWriter:
+    """
+    Sink that appends frames to a binary trajectory as they arrive.
+
+    Can be passed as the sink of MC.run_mc. Use it as a context manager,
+    or call close() when done.
+    """
+
+    def __init__(self, filename, n_beads, mode="wb"):
+        self.filename = filename
+        self.n_beads = n_beads
+        self.f = open(filename, mode)
+        if self.f.tell() == 0:
+            self.f.write(HEADER.pack(MAGIC, n_beads, 0))
+
+    def __call__(self, step, path, energy):
+        x0, y0 = path[0]
+        self.f.write(RECORD_HEAD.pack(step, energy, x0, y0))
+        self.f.write(encode_path(path))
+
+    def checkpoint_state(self):
+        self.f.flush()
+        return {
+            "filename": os.path.basename(self.filename),
+            "n_beads": self.n_beads,
+            "position": self.f.tell()
+        }
+
+    def restore_state(self, state):
+        """
+        Drop the frames written after the checkpoint.
+
+        Raises ValueError if the file is not the one the checkpoint was
+        taken with, or is shorter than the saved offset (deleted or
+        overwritten since), instead of padding it.
+        """
+        if state["filename"] != os.path.basename(self.filename) or state["n_beads"] != self.n_beads:
+            raise ValueError(f"Checkpoint was taken with {state['filename']} ({state['n_beads']} beads), "
+                             f"not {self.filename} ({self.n_beads} beads)")
+
+        self.f.flush()
+        with open(self.filename, "rb") as f:
+            magic, n_beads, _ = HEADER.unpack(f.read(HEADER.size))
+        size = os.path.getsize(self.filename)
+        if magic != MAGIC or n_beads != self.n_beads or size < state["position"]:
+            raise ValueError(f"{self.filename} has {size} bytes, less than the checkpoint offset "
+                             f"{state['position']}, or a different header; it was replaced since")
+
+        self.f.truncate(state["position"])
+        self.f.seek(state["position"])
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class BinaryTrajectory:
+    """
+    Memory-mapped reader for binary trajectories.
+
+    steps, energies, origins and bonds are views into the file, so opening
+    a trajectory costs nothing and frames are decoded only when asked for.
+
+    traj[i] returns one path as a list of (x, y) tuples, like the entries
+    of analysis.read_trajectory. Iterating yields paths in order.
+    """
+
+    def __init__(self, filename):
+        with open(filename, "rb") as f:
+            magic, n_beads, _ = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a binary HP trajectory")
+
+        self.n_beads = n_beads
+        dtype = record_dtype(n_beads)
+        if os.path.getsize(filename) > HEADER.size:
+            self.records = np.memmap(filename, dtype=dtype, mode="r", offset=HEADER.size)
+        else:
+            # numpy cannot map an empty region
+            self.records = np.zeros(0, dtype=dtype)
+        self.steps = self.records["step"]
+        self.energies = self.records["energy"]
+        self.origins = self.records["origin"]
+        self.bonds = self.records["bonds"]
+
+    def __len__(self):
+        return len(self.records)
+
+    def coordinates(self, start=0, stop=None):
+        """
+        Coordinates of frames start..stop as an (N, n_beads, 2) array.
+        """
+        return decode_coordinates(self.origins[start:stop], self.bonds[start:stop], self.n_beads)
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        return [tuple(site) for site in self.coordinates(i, i + 1)[0].tolist()]
+
+    def __iter__(self):
+        for start, coords in self.chunks():
+            for path in coords.tolist():
+                yield [tuple(site) for site in path]
+
+    def chunks(self, chunk_size=65536):
+        """
+        Yield (start, coordinates) blocks so long trajectories are decoded
+        without holding every frame in memory.
+        """
+        for start in range(0, len(self), chunk_size):
+            yield start, self.coordinates(start, start + chunk_size)
+
+    def end_to_end(self, chunk_size=65536):
+        """
+        End-to-end distance of every frame as a float array.
+        """
+        out = np.empty(len(self))
+        for start, coords in self.chunks(chunk_size):
+            d = coords[:, -1] - coords[:, 0]
+            out[start:start + len(coords)] = np.sqrt((d ** 2).sum(axis=1))
+        return out
+
+def write_binary_trajectory(trajectory, energies, filename, stride=1):
+    """
+    Write an in-memory trajectory (as returned by MC.run_mc) in binary form.
+    """
+    with BinaryTrajectoryWriter(filename, len(trajectory[0])) as writer:
+        for frame, (path, energy) in enumerate(zip(trajectory, energies)):
+            writer(frame * stride, path, energy)
+
+def convert_text_trajectory(text_file, binary_file):
+    """
+    Convert a text trajectory written by MC.write_trajectory to binary.
+
+    The text file is read line by line, so it never has to fit in memory.
+    Returns the number of frames converted.
+    """
+    writer = None
+    n_frames = 0
+
+    with open(text_file, "r") as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+
+            step = int(parts[0])
+            energy = float(parts[1])
+            path = []
+            for item in parts[2:]:
+                x, y = item.split(",")
+                path.append((int(x), int(y)))
+
+            if writer is None:
+                writer = BinaryTrajectoryWriter(binary_file, len(path))
+            writer(step, path, energy)
+            n_frames += 1
+
+    if writer is not None:
+        writer.close()
+
+    return n_frames
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python3 binary_trajectory.py <trajectory.txt> <trajectory.hptraj>")
+        sys.exit()
+
+    n_frames = convert_text_trajectory(sys.argv[1], sys.argv[2])
+    print("Converted frames:", n_frames)
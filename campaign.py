@@ -0,0 +1,144 @@
+import os
+import random
+import sys
+from multiprocessing import Pool
+
+from analysis import MCAccumulator
+from binary_trajectory import BinaryTrajectoryWriter
+from MC import Chain, run_chain, straight_path
+
+"""
+Run many independent MC seeds of one sequence in a process pool.
+
+Every run gets its own random.Random stream, seeded from the master seed
+and the run index only, so a campaign gives bit-identical results when it
+is repeated with the same master seed, whatever the number of processes.
+For each seed the runner writes trajectory_<seq>_<seed>.hptraj and an
+output_<seq>_<seed>.txt summary, as in results/*/MC_results.
+"""
+
+def seed_for(master_seed, index):
+    """
+    Seed of run number index, derived deterministically from master_seed.
+    """
+    return random.Random(f"{master_seed}:{index}").getrandbits(32)
+
+def run_seed(args):
+    """
+    Worker: one full MC run with its own seeded random stream.
+    """
+    sequence, n_steps, Beta, Epsilon, seed, stride, out_dir, move_weights = args
+
+    rng = random.Random(seed)
+    chain = Chain(straight_path(sequence), sequence, Epsilon)
+    acc = MCAccumulator()
+
+    trajectory_file = os.path.join(out_dir, f"trajectory_{sequence}_{seed}.hptraj")
+    output_file = os.path.join(out_dir, f"output_{sequence}_{seed}.txt")
+
+    with BinaryTrajectoryWriter(trajectory_file, len(sequence)) as writer:
+        sinks = [writer, acc]
+        for sink in sinks:
+            sink(0, chain.path(), chain.energy)
+        accepted_moves, invalid_moves = run_chain(chain, n_steps, Beta, sinks, stride,
+                                                  move_weights=move_weights, rng=rng)
+
+    mc_results = acc.results()
+
+    with open(output_file, "w") as f:
+        f.write(f"Sequence: {sequence}\n")
+        f.write(f"Trajectory file: {os.path.basename(trajectory_file)}\n")
+        f.write(f"Seed: {seed}\n")
+        f.write("\nMC results\n")
+        f.write(f"Frames: {mc_results['n_frames']}\n")
+        f.write(f"Average energy: {mc_results['avg_energy']}\n")
+        f.write(f"Average end2end: {mc_results['avg_end2end']}\n")
+        f.write(f"Sampled macrostates: {mc_results['macrostates']}\n")
+        f.write(f"Accepted moves: {accepted_moves}\n")
+        f.write(f"Invalid moves: {invalid_moves}\n")
+        f.write(f"Acceptance ratio: {accepted_moves / n_steps}\n")
+        f.write(f"Final energy: {chain.energy}\n")
+        f.write(f"Final path: {chain.path()}\n")
+
+    return {
+        "seed": seed,
+        "accepted_moves": accepted_moves,
+        "invalid_moves": invalid_moves,
+        "acceptance_ratio": accepted_moves / n_steps,
+        "final_energy": chain.energy,
+        "final_path": chain.path(),
+        "avg_energy": mc_results["avg_energy"],
+        "avg_end2end": mc_results["avg_end2end"],
+        "trajectory_file": trajectory_file,
+        "output_file": output_file
+    }
+
+def run_campaign(sequence, n_seeds, n_steps, Beta, Epsilon, master_seed=0, stride=1,
+                 out_dir=".", processes=None, move_weights=None):
+    """
+    Run n_seeds independent MC simulations of one sequence in parallel.
+
+    Parameters
+    ----------
+    sequence : str
+        HP sequence
+    n_seeds : int
+        Number of independent runs
+    n_steps : int
+        Monte Carlo steps per run
+    Beta : float
+        Inverse temperature
+    Epsilon : float
+        H-H contact strength
+    master_seed : int
+        Seed from which every run's seed is derived
+    stride : int
+        Save every stride-th frame to the trajectory files
+    out_dir : str
+        Directory for the trajectory and output files
+    processes : int or None
+        Worker processes (default: all cores)
+    move_weights : dict or None
+        Mixing weights over MC.move_set (default: reptation only)
+
+    Returns
+    -------
+    runs : list of dict
+        One summary per seed, in seed-index order: seed, accepted_moves,
+        invalid_moves, acceptance_ratio, final_energy, final_path,
+        avg_energy, avg_end2end, trajectory_file and output_file.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    tasks = [
+        (sequence, n_steps, Beta, Epsilon, seed_for(master_seed, i), stride, out_dir, move_weights)
+        for i in range(n_seeds)
+    ]
+
+    with Pool(processes) as pool:
+        runs = pool.map(run_seed, tasks)
+
+    return runs
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print("Usage: python3 campaign.py <sequence> <n_seeds> <n_steps> [master_seed] [out_dir]")
+        sys.exit()
+
+    Beta = 10.0 / 6.0
+    Epsilon = 1
+
+    sequence = sys.argv[1]
+    n_seeds = int(sys.argv[2])
+    n_steps = int(sys.argv[3])
+    master_seed = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    out_dir = sys.argv[5] if len(sys.argv) > 5 else "."
+
+    runs = run_campaign(sequence, n_seeds, n_steps, Beta, Epsilon, master_seed, out_dir=out_dir)
+
+    print("Sequence:", sequence)
+    print("Master seed:", master_seed)
+    print()
+    print("Seed    Acceptance    Final_energy    Average_energy")
+    for run in runs:
+        print(run["seed"], "   ", run["acceptance_ratio"], "   ", run["final_energy"], "   ", run["avg_energy"])
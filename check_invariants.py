@@ -0,0 +1,304 @@
+import csv
+import hashlib
+import math
+import os
+import random
+import sys
+import tempfile
+
+import analysis
+import enumeration
+import MC
+from binary_trajectory import BinaryTrajectoryWriter, write_binary_trajectory
+from contact_cache import WalkCache, build_walk_cache
+from instrumentation import Profiler
+
+"""
+Regression checks for invariants of the MC engine.
+
+    python3 check_invariants.py
+
+runs every check, prints OK or the problems found, and exits with status
+1 if any check failed. The checks are small enough to run in seconds:
+
+    reference trajectory : a seeded reptation run gives the same frames
+                           as the original implementation of run_mc
+    energies             : Chain.energy equals analysis.hp_contacts of the
+                           current path after every step of a run that
+                           mixes all moves in MC.move_set
+    short chains         : every move, alone and mixed, runs on chains of
+                           1 to 4 beads and keeps Chain.energy exact
+    lowest energy        : analysis.lowest_energy_microstates and
+                           WalkCache.lowest_energy_microstates pick the
+                           same ground states as hp_contacts on every
+                           path, for attractive, zero and repulsive Epsilon
+    partition function   : analysis.analyze_paths gives the same Z as
+                           summing exp(-E/kT) path by path
+    trajectory formats   : analysis.analyze_mc_trajectory gives the same
+                           keys and values for a run read as a list of
+                           paths and as a binary .hptraj file
+    profiler windows     : the rolling windows of a Profiler cover every
+                           step of a run, also one shorter than a window
+    resume               : a run killed between checkpoints and resumed
+                           leaves the same .hptraj file, accumulator,
+                           final path and move counts as an uninterrupted
+                           run
+"""
+
+Beta = 10.0 / 6.0
+Epsilon = 1
+
+# Digest of the frames of run_mc(reference_sequence, straight_path, 20000,
+# Beta, Epsilon) after random.seed(3), as given by the original
+# implementation (global random module, reptation only, every frame kept)
+reference_sequence = "HPHPPHHPHH"
+reference_steps = 20000
+reference_seed = 3
+reference_digest = "146f062cfffbc0b0f129274a95db7a99c5c74c1dcd0ecca6b4f155f2ee12c833"
+
+def trajectory_digest(trajectory, energies):
+    """
+    SHA-256 of the frames in the text format of MC.write_trajectory.
+    """
+    digest = hashlib.sha256()
+    for step, (path, energy) in enumerate(zip(trajectory, energies)):
+        coords = " ".join(f"{x},{y}" for (x, y) in path)
+        digest.update(f"{step} {energy} {coords}\n".encode())
+    return digest.hexdigest()
+
+def check_reference_trajectory():
+    """
+    Seeded run_mc against the digest of the original implementation.
+    """
+    random.seed(reference_seed)
+    trajectory, energies, _, _ = MC.run_mc(reference_sequence, MC.straight_path(reference_sequence),
+                                           reference_steps, Beta, Epsilon)
+
+    digest = trajectory_digest(trajectory, energies)
+    if digest != reference_digest:
+        return [f"trajectory digest {digest} differs from the reference {reference_digest}"]
+    return []
+
+def check_energies(sequence="HPHHPPHHHPHPHHPH", n_steps=20000, seed=1):
+    """
+    Chain.energy against hp_contacts after every step of a mixed-move run.
+    """
+    move_weights = {name: 1.0 for name in MC.move_set}
+    problems = []
+
+    def compare(step, path, energy):
+        expected = analysis.hp_contacts(path, sequence, Epsilon)
+        if energy != expected and len(problems) < 10:
+            problems.append(f"step {step}: Chain.energy = {energy}, hp_contacts = {expected}")
+
+    MC.run_mc(sequence, MC.straight_path(sequence), n_steps, Beta, Epsilon, sink=compare,
+              move_weights=move_weights, rng=random.Random(seed))
+    return problems
+
+def check_short_chains(sequences=("H", "HP", "HPH", "HPPH"), n_steps=2000, seed=5):
+    """
+    run_mc with each move alone and all of them mixed on chains too short for some moves.
+    """
+    problems = []
+
+    for sequence in sequences:
+        weights = [{name: 1.0} for name in MC.move_set] + [{name: 1.0 for name in MC.move_set}]
+        for move_weights in weights:
+            label = "+".join(move_weights)
+
+            def compare(step, path, energy):
+                if energy != analysis.hp_contacts(path, sequence, Epsilon):
+                    raise ValueError(f"step {step}: Chain.energy = {energy}")
+
+            try:
+                MC.run_mc(sequence, MC.straight_path(sequence), n_steps, Beta, Epsilon, sink=compare,
+                          move_weights=move_weights, rng=random.Random(seed))
+            except Exception as e:
+                problems.append(f"{sequence} with {label}: {type(e).__name__}: {e}")
+
+    return problems
+
+def check_lowest_energy(sequence="HPHPPHHPHH", epsilons=(1, 0, -1, 0.3)):
+    """
+    lowest_energy_microstates (path list and walk cache) against the
+    minimum of hp_contacts over all paths.
+    """
+    paths = enumeration.enumerate_paths(sequence)
+    cache = WalkCache(build_walk_cache(len(sequence)))
+    problems = []
+
+    for eps in epsilons:
+        energies = [analysis.hp_contacts(path, sequence, eps) for path in paths]
+        min_energy = min(energies)
+        lowest_paths = [path for path, E in zip(paths, energies) if E == min_energy]
+
+        E, found = analysis.lowest_energy_microstates(paths, sequence, eps)
+        if E != min_energy or found != lowest_paths:
+            problems.append(f"Epsilon = {eps}: E = {E} with {len(found)} paths, "
+                            f"expected {min_energy} with {len(lowest_paths)}")
+
+        E, found = cache.lowest_energy_microstates(sequence, eps)
+        if E != min_energy or sorted(found) != sorted(lowest_paths):
+            problems.append(f"Epsilon = {eps}, walk cache: E = {E} with {len(found)} paths, "
+                            f"expected {min_energy} with {len(lowest_paths)}")
+
+    return problems
+
+def check_partition_function(sequences=("PPPPPPPP", "HPHPPHHP", "HHHHHHHH"), kT=0.6):
+    """
+    Z of analyze_paths against the path-by-path sum of Boltzmann factors.
+    """
+    problems = []
+
+    for sequence in sequences:
+        paths = enumeration.enumerate_paths(sequence)
+        expected = 0
+        for path in paths:
+            expected += math.exp(-analysis.hp_contacts(path, sequence, Epsilon) / kT)
+
+        Z = analysis.analyze_paths(paths, sequence, kT, Epsilon)["Z"]
+        if Z != expected:
+            problems.append(f"{sequence}: Z = {Z}, path by path {expected}")
+
+    return problems
+
+def check_trajectory_formats(sequence="HPHHPPHHHPHPHHPH", n_steps=20000, seed=2):
+    """
+    analyze_mc_trajectory on the same frames in memory and in a .hptraj file.
+    """
+    trajectory, energies, _, _ = MC.run_mc(sequence, MC.straight_path(sequence), n_steps, Beta, Epsilon,
+                                           move_weights={move: 1.0 for move in MC.move_set},
+                                           rng=random.Random(seed))
+    from_list = analysis.analyze_mc_trajectory(trajectory, energies)
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "run.hptraj")
+        write_binary_trajectory(trajectory, energies, filename)
+        from_file = analysis.analyze_mc_trajectory(*analysis.load_trajectory(filename))
+
+    if from_list.keys() != from_file.keys():
+        return [f"keys differ: {sorted(from_list)} and {sorted(from_file)}"]
+
+    problems = []
+    for key, value in from_list.items():
+        other = from_file[key]
+        if isinstance(value, float):
+            same = math.isclose(value, other, rel_tol=1e-12)
+        else:
+            same = value == other
+        if not same:
+            problems.append(f"{key}: {value} from the list, {other} from the .hptraj file")
+    return problems
+
+def check_profiler_windows(sequence="HPHPPHHPHH", window=10000, run_lengths=(5000, 25000)):
+    """
+    Steps in Profiler.summary and export_csv windows against the run length.
+    """
+    problems = []
+
+    for n_steps in run_lengths:
+        profiler = Profiler(window)
+        MC.run_mc(sequence, MC.straight_path(sequence), n_steps, Beta, Epsilon,
+                  rng=random.Random(0), profiler=profiler)
+
+        steps = [row["steps"] for row in profiler.summary()["windows"]]
+        if sum(steps) != n_steps:
+            problems.append(f"{n_steps} steps: summary windows hold {steps}")
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "metrics.csv")
+            profiler.export_csv(filename)
+            with open(filename, newline="") as f:
+                rows = list(csv.DictReader(f))
+        if sum(int(row["steps"]) for row in rows) != n_steps:
+            problems.append(f"{n_steps} steps: CSV windows hold {[row['steps'] for row in rows]}")
+
+    return problems
+
+class Interrupted(Exception):
+    """
+    Raised by a sink to stop a run as if the process had been killed.
+    """
+
+def checkpointed_run(directory, name, sequence, n_steps, seed, checkpoint_every,
+                     kill_at=None, resume=False):
+    """
+    run_mc streaming to a binary trajectory and an MCAccumulator, with
+    checkpoints, optionally stopped at step kill_at.
+
+    Returns the accumulator and the run_mc result, or None if stopped.
+    """
+    acc = analysis.MCAccumulator(Beta)
+    trajectory_file = os.path.join(directory, name + ".hptraj")
+    checkpoint = os.path.join(directory, name + ".pkl")
+
+    def kill(step, path, energy):
+        if step == kill_at:
+            raise Interrupted
+
+    with BinaryTrajectoryWriter(trajectory_file, len(sequence), "ab" if resume else "wb") as writer:
+        try:
+            result = MC.run_mc(sequence, MC.straight_path(sequence), n_steps, Beta, Epsilon,
+                               sink=[writer, acc, kill], move_weights={move: 1.0 for move in MC.move_set},
+                               rng=random.Random(seed), checkpoint=checkpoint,
+                               checkpoint_every=checkpoint_every, resume=resume)
+        except Interrupted:
+            return None
+
+    return acc, result
+
+def check_resume(sequence="HHPPHPPHHPH", n_steps=20000, checkpoint_every=3000, kill_at=10500, seed=7):
+    """
+    Checkpoint + resume against an uninterrupted run, byte for byte.
+    """
+    problems = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        whole_acc, whole = checkpointed_run(directory, "whole", sequence, n_steps, seed, checkpoint_every)
+
+        if checkpointed_run(directory, "split", sequence, n_steps, seed, checkpoint_every, kill_at) is not None:
+            return [f"run was not stopped at step {kill_at}"]
+        split_acc, split = checkpointed_run(directory, "split", sequence, n_steps, seed, checkpoint_every,
+                                            resume=True)
+
+        with open(os.path.join(directory, "whole.hptraj"), "rb") as f:
+            whole_bytes = f.read()
+        with open(os.path.join(directory, "split.hptraj"), "rb") as f:
+            split_bytes = f.read()
+        if whole_bytes != split_bytes:
+            problems.append(f"trajectories differ ({len(whole_bytes)} and {len(split_bytes)} bytes)")
+
+        if whole_acc.results() != split_acc.results():
+            problems.append("accumulator results differ")
+
+        if whole[2:] != split[2:]:
+            problems.append(f"accepted/invalid moves differ: {whole[2:]} and {split[2:]}")
+
+        whole_path = MC.load_checkpoint(os.path.join(directory, "whole.pkl"))["path"]
+        split_path = MC.load_checkpoint(os.path.join(directory, "split.pkl"))["path"]
+        if whole_path != split_path:
+            problems.append("final paths differ")
+
+    return problems
+
+checks = {
+    "reference trajectory": check_reference_trajectory,
+    "energies": check_energies,
+    "short chains": check_short_chains,
+    "lowest energy": check_lowest_energy,
+    "partition function": check_partition_function,
+    "trajectory formats": check_trajectory_formats,
+    "profiler windows": check_profiler_windows,
+    "resume": check_resume
+}
+
+if __name__ == "__main__":
+    failed = False
+    for name, check in checks.items():
+        problems = check()
+        print(name + ":", "OK" if not problems else "FAILED")
+        for problem in problems:
+            print("   ", problem)
+        failed = failed or bool(problems)
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,231 @@
+import os
+import sys
+
+import numpy as np
+
+from analysis import analyze_histogram, batch_properties, contact_energies
+from binary_trajectory import decode_coordinates, directions, packed_size
+from enumeration import iter_paths, new_histogram_bin
+
+"""
+Sequence-independent cache of all walks of a given length.
+
+The walks from enumeration.enumerate_paths depend only on the chain
+length, so they are enumerated once per length and saved to
+<cache_dir>/walks_<n>.npz, by default in contact_cache/ next to this
+module (or the directory named by $HP_CONTACT_CACHE), with, for every walk:
+    bonds    : packed 2-bit bond directions (as in binary_trajectory)
+    contacts : bitset over the nonbonded bead pairs that are lattice neighbors
+    rg       : radius of gyration
+    end2end  : end-to-end distance
+
+On the square lattice only pairs (i, j) with j - i odd and >= 3 can be in
+contact, so only those pairs get a bit. The HP energy of every walk for a
+sequence is then -Epsilon times the popcount of (contacts & H-H mask),
+computed for all walks at once.
+"""
+
+# Shared by every script, wherever it is run from; HP_CONTACT_CACHE overrides it
+default_cache_dir = os.environ.get(
+    "HP_CONTACT_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "contact_cache")
+)
+
+# Number of set bits of every byte value
+popcount_table = np.array([bin(b).count("1") for b in range(256)], dtype=np.uint8)
+
+def contact_pairs(n):
+    """
+    Bead pairs (i, j) that can be nonbonded lattice neighbors, in bit order.
+    """
+    pairs = [(i, j) for i in range(n) for j in range(i + 3, n, 2)]
+    pair_i = np.array([i for i, j in pairs], dtype=np.intp)
+    pair_j = np.array([j for i, j in pairs], dtype=np.intp)
+    return pair_i, pair_j
+
+def hh_mask(sequence):
+    """
+    Packed bitset of the contact pairs where both beads are H.
+    """
+    is_h = np.array([c == "H" for c in sequence])
+    pair_i, pair_j = contact_pairs(len(sequence))
+    return np.packbits(is_h[pair_i] & is_h[pair_j], bitorder="little")
+
+def pack_bonds(coords):
+    """
+    Packed bond directions of an (N, n, 2) coordinate array.
+    """
+    N, n, _ = coords.shape
+    steps = np.diff(coords, axis=1)
+    codes = np.zeros(steps.shape[:2], dtype=np.uint8)
+    for step, code in directions.items():
+        codes[(steps[:, :, 0] == step[0]) & (steps[:, :, 1] == step[1])] = code
+
+    padded = np.zeros((N, 4 * packed_size(n)), dtype=np.uint8)
+    padded[:, :n - 1] = codes
+    padded = padded.reshape(N, -1, 4)
+    return padded[:, :, 0] | (padded[:, :, 1] << 2) | (padded[:, :, 2] << 4) | (padded[:, :, 3] << 6)
+
+def walk_properties(coords, pair_i, pair_j):
+    """
+    Packed bonds, contact bitsets, Rg and end-to-end distance of (N, n, 2) walks.
+    """
+    d = np.abs(coords[:, pair_i] - coords[:, pair_j]).sum(axis=2)
+    contacts = np.packbits(d == 1, axis=1, bitorder="little")
+
+    props = batch_properties(coords, "P" * coords.shape[1], 0)
+
+    return pack_bonds(coords), contacts, props["rg"], props["end2end"]
+
+def build_walk_cache(n, chunk_size=100000):
+    """
+    Enumerate all walks of n beads and compute their cached properties.
+
+    Returns a dict of arrays: n, bonds, contacts, rg, end2end.
+    """
+    pair_i, pair_j = contact_pairs(n)
+    parts = []
+    chunk = []
+
+    def flush():
+        coords = np.array(chunk, dtype=np.int32).reshape(len(chunk), n, 2)
+        parts.append(walk_properties(coords, pair_i, pair_j))
+        chunk.clear()
+
+    for path in iter_paths("P" * n):
+        chunk.append(path)
+        if len(chunk) == chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+    bonds, contacts, rg, ree = (np.concatenate(column) for column in zip(*parts))
+
+    return {"n": np.array(n), "bonds": bonds, "contacts": contacts, "rg": rg, "end2end": ree}
+
+class WalkCache:
+    """
+    All walks of one chain length with their sequence-independent properties.
+
+    Use load_walk_cache to get one from disk (building it if needed).
+    """
+
+    def __init__(self, arrays):
+        self.n = int(arrays["n"])
+        self.bonds = arrays["bonds"]
+        self.contacts = arrays["contacts"]
+        self.rg = arrays["rg"]
+        self.end2end = arrays["end2end"]
+
+    def __len__(self):
+        return len(self.rg)
+
+    def contact_counts(self, sequence, chunk_size=1000000):
+        """
+        Number of H-H contacts of every walk for a sequence.
+        """
+        if len(sequence) != self.n:
+            raise ValueError(f"Cache is for length {self.n}, sequence has length {len(sequence)}")
+
+        mask = hh_mask(sequence)
+        counts = np.empty(len(self), dtype=np.int64)
+        for start in range(0, len(self), chunk_size):
+            bits = self.contacts[start:start + chunk_size] & mask
+            counts[start:start + chunk_size] = popcount_table[bits].sum(axis=1)
+        return counts
+
+    def energies(self, sequence, Epsilon):
+        """
+        HP energy of every walk, same as hp_contacts on each path.
+        """
+        return -Epsilon * self.contact_counts(sequence)
+
+    def histogram(self, sequence, Epsilon):
+        """
+        Energy histogram in the format of enumeration.energy_histogram.
+        """
+        counts = self.contact_counts(sequence)
+        size = int(counts.max()) + 1 if len(counts) else 0
+
+        count = np.bincount(counts, minlength=size)
+        sum_rg = np.bincount(counts, weights=self.rg, minlength=size)
+        sum_rg2 = np.bincount(counts, weights=self.rg ** 2, minlength=size)
+        sum_end2end = np.bincount(counts, weights=self.end2end, minlength=size)
+
+        histogram = {}
+        for c in range(size - 1, -1, -1):
+            if count[c]:
+                b = new_histogram_bin()
+                b["count"] = int(count[c])
+                b["sum_rg"] = float(sum_rg[c])
+                b["sum_rg2"] = float(sum_rg2[c])
+                b["sum_end2end"] = float(sum_end2end[c])
+                histogram[0 - Epsilon * c] = b
+        return histogram
+
+    def paths(self, indices=None):
+        """
+        Walks as lists of (x, y) tuples, all of them or only those at indices.
+        """
+        bonds = self.bonds if indices is None else self.bonds[indices]
+        coords = decode_coordinates(np.zeros((len(bonds), 2), dtype=np.int32), bonds, self.n)
+        return [[(int(x), int(y)) for x, y in walk] for walk in coords]
+
+    def lowest_energy_microstates(self, sequence, Epsilon):
+        """
+        Same as analysis.lowest_energy_microstates, without scoring paths one by one.
+        """
+        counts = self.contact_counts(sequence)
+        table = contact_energies(int(counts.max(initial=0)), Epsilon)
+        energies = np.array(table)[counts]
+
+        lowest = np.flatnonzero(energies == energies.min())
+        return table[counts[lowest[0]]], self.paths(lowest)
+
+def load_walk_cache(n, cache_dir=default_cache_dir):
+    """
+    Load the walk cache for length n, enumerating and saving it first if missing.
+    """
+    filename = os.path.join(cache_dir, f"walks_{n}.npz")
+
+    if not os.path.exists(filename):
+        os.makedirs(cache_dir, exist_ok=True)
+        arrays = build_walk_cache(n)
+        tmp = filename + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, filename)
+
+    with np.load(filename) as data:
+        return WalkCache({key: data[key] for key in data.files})
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 contact_cache.py <sequence> [kT] [cache_dir]")
+        sys.exit()
+
+    Epsilon = 1
+
+    sequence = sys.argv[1]
+    kT = float(sys.argv[2]) if len(sys.argv) > 2 else 0.6
+    cache_dir = sys.argv[3] if len(sys.argv) > 3 else default_cache_dir
+
+    cache = load_walk_cache(len(sequence), cache_dir)
+    results = analyze_histogram(cache.histogram(sequence, Epsilon), kT)
+    min_energy, lowest_paths = cache.lowest_energy_microstates(sequence, Epsilon)
+
+    print("Sequence =", sequence)
+    print("Number of conformations =", results["n_paths"])
+    print("Partition function =", results["Z"])
+    print("Average radius of gyration =", results["avg_rg"])
+    print("Average end-to-end distance =", results["average_end2end"])
+    print("Average energy =", results["average_energy"])
+    print("Entropy S1 =", results["S1"])
+    print("Entropy S2 =", results["S2"])
+
+    print("\nMacrostates (Energy : Degeneracy)")
+    for energy in sorted(results["macrostates"]):
+        print(f"{energy} : {results['macrostates'][energy]}")
+
+    print("Lowest energy =", min_energy)
+    print("Number of lowest-energy microstates =", len(lowest_paths))
@@ -1,3 +1,5 @@
+import math
+
 moves = {
     "R": (1, 0),
     "L": (-1, 0),
@@ -68,3 +70,142 @@ def enumerate_paths(sequence):
     backtrack(start_path, visited, first_turn_done)
 
     return all_paths
+
+def iter_paths(sequence):
+    """
+    Yield the same walks as enumerate_paths, in the same order, one at a time.
+
+    Only the current walk is held in memory, so the number of walks is
+    limited by time rather than RAM.
+    """
+    n = len(sequence)
+
+    if n == 1:
+        yield [(0, 0)]
+        return
+
+    path = [(0, 0), (1, 0)]
+    visited = {(0, 0), (1, 0)}
+
+    def grow(first_turn_done):
+        if len(path) == n:
+            yield path.copy()
+            return
+
+        head = path[-1]
+
+        if not first_turn_done:
+            candidate_moves = ["R", "U"]
+        else:
+            candidate_moves = ["R", "L", "U", "D"]
+
+        for move in candidate_moves:
+            new_position = add_vector(head, moves[move])
+
+            if new_position in visited:
+                continue
+
+            visited.add(new_position)
+            path.append(new_position)
+
+            yield from grow(first_turn_done or move == "U")
+
+            path.pop()
+            visited.remove(new_position)
+
+    yield from grow(False)
+
+def new_histogram_bin():
+    return {"count": 0, "sum_rg": 0.0, "sum_rg2": 0.0, "sum_end2end": 0.0}
+
+def energy_histogram(sequence, Epsilon, prefix=None):
+    """
+    Enumerate all walks and fold them into a per-energy histogram on the fly.
+
+    The H-H contact count is updated as each bead is placed, and the
+    coordinate sums needed for Rg are carried along the recursion, so
+    each walk costs O(1) extra work and no walk is ever stored.
+
+    If prefix is given (a walk starting [(0,0), (1,0), ...], e.g. from
+    iter_paths), only the walks that begin with it are counted, so
+    disjoint prefixes split the enumeration into independent subtrees.
+
+    Returns
+    -------
+    histogram : dict
+        Energy -> {"count", "sum_rg", "sum_rg2", "sum_end2end"}, i.e. the
+        degeneracy of the macrostate and its sums of Rg, Rg^2 and
+        end-to-end distance. analysis.analyze_histogram turns this into
+        exact thermodynamics at any kT.
+    """
+    n = len(sequence)
+    is_h = [c == "H" for c in sequence]
+
+    # Bins are indexed by number of H-H contacts while enumerating
+    bins = {}
+
+    def record(contacts, sx, sy, s2, head):
+        rg2 = max(n * s2 - sx * sx - sy * sy, 0) / (n * n)
+        b = bins.get(contacts)
+        if b is None:
+            b = bins[contacts] = new_histogram_bin()
+        b["count"] += 1
+        b["sum_rg"] += math.sqrt(rg2)
+        b["sum_rg2"] += rg2
+        b["sum_end2end"] += math.sqrt(head[0] ** 2 + head[1] ** 2)
+
+    occupied = {}
+
+    def contacts_gained(site, k):
+        """
+        New H-H contacts made by placing bead k at site.
+        """
+        if not is_h[k]:
+            return 0
+        gained = 0
+        for step in moves.values():
+            j = occupied.get(add_vector(site, step))
+            if j is not None and j != k - 1 and is_h[j]:
+                gained += 1
+        return gained
+
+    def grow(head, k, contacts, sx, sy, s2, first_turn_done):
+        if k == n:
+            record(contacts, sx, sy, s2, head)
+            return
+
+        if not first_turn_done:
+            candidate_moves = ["R", "U"]
+        else:
+            candidate_moves = ["R", "L", "U", "D"]
+
+        for move in candidate_moves:
+            new_position = add_vector(head, moves[move])
+
+            if new_position in occupied:
+                continue
+
+            x, y = new_position
+            gained = contacts_gained(new_position, k)
+            occupied[new_position] = k
+            grow(new_position, k + 1, contacts + gained, sx + x, sy + y, s2 + x * x + y * y,
+                 first_turn_done or move == "U")
+            del occupied[new_position]
+
+    if prefix is None:
+        prefix = [(0, 0), (1, 0)][:n]
+
+    contacts = 0
+    for k, site in enumerate(prefix):
+        contacts += contacts_gained(site, k)
+        occupied[site] = k
+
+    sx = sum(x for x, y in prefix)
+    sy = sum(y for x, y in prefix)
+    s2 = sum(x * x + y * y for x, y in prefix)
+
+    # Before the first upward turn the walk is still on the x axis
+    first_turn_done = any(y != 0 for x, y in prefix)
+    grow(prefix[-1], len(prefix), contacts, sx, sy, s2, first_turn_done)
+
+    return {0 - Epsilon * c: bins[c] for c in sorted(bins, reverse=True)}
@@ -0,0 +1,158 @@
+import sys
+import time
+
+from enumeration import add_vector, moves
+
+"""
+Exact ground states of the HP model by branch and bound.
+
+Walks are grown with the same backtracking and symmetry conventions as
+enumeration.enumerate_paths (first bead at (0,0), second at (1,0), first
+turn upward), so the ground states found are exactly those that
+analysis.lowest_energy_microstates would pick out of the full path list.
+
+A partial walk is dropped as soon as the H-H contacts it has plus an
+upper bound on the contacts still possible cannot reach the best count
+found so far. The bound uses the parity of the square lattice: a contact
+always joins an even and an odd bead, so the future contacts are limited
+by whichever parity class has less capacity left. The capacity of a
+future H bead is 2 (3 for the last bead), and that of a placed H bead is
+its number of free lattice neighbors.
+"""
+
+def future_capacities(sequence):
+    """
+    even[k], odd[k]: total contact capacity of H beads k, k+1, ... by parity.
+    """
+    n = len(sequence)
+    even = [0] * (n + 1)
+    odd = [0] * (n + 1)
+    for k in range(n - 1, -1, -1):
+        even[k], odd[k] = even[k + 1], odd[k + 1]
+        if sequence[k] == "H":
+            cap = 3 if k == n - 1 else 2
+            if k % 2 == 0:
+                even[k] += cap
+            else:
+                odd[k] += cap
+    return even, odd
+
+def ground_states(sequence, Epsilon):
+    """
+    Lowest energy and all walks that have it.
+
+    Returns
+    -------
+    min_energy : float
+        Lowest HP energy
+    lowest_paths : list of paths
+        All ground-state walks (same set as lowest_energy_microstates)
+    """
+    n = len(sequence)
+    is_h = [c == "H" for c in sequence]
+
+    if n <= 2:
+        return 0, [[(0, 0), (1, 0)][:n]]
+
+    future_even, future_odd = future_capacities(sequence)
+
+    path = [(0, 0), (1, 0)]
+    occupied = {(0, 0): 0, (1, 0): 1}
+
+    # Free lattice neighbors of the placed H beads, summed by parity
+    free = [0, 0]
+    for k, site in enumerate(path):
+        if is_h[k]:
+            free[k % 2] += sum(add_vector(site, step) not in occupied for step in moves.values())
+
+    best = [0]
+    lowest_paths = []
+
+    def grow(k, contacts, first_turn_done):
+        if k == n:
+            if contacts > best[0]:
+                best[0] = contacts
+                lowest_paths.clear()
+            if contacts == best[0]:
+                lowest_paths.append(path.copy())
+            return
+
+        # One free neighbor of the head is taken by the bond to bead k
+        placed = [free[0], free[1]]
+        if is_h[k - 1]:
+            placed[(k - 1) % 2] -= 1
+
+        bound = min(future_even[k] + placed[0], future_odd[k] + placed[1], future_even[k] + future_odd[k])
+        if contacts + bound < best[0]:
+            return
+
+        head = path[-1]
+
+        if not first_turn_done:
+            candidate_moves = ["R", "U"]
+        else:
+            candidate_moves = ["R", "L", "U", "D"]
+
+        # Score the children first, so contact-rich branches raise best early
+        children = []
+        for move in candidate_moves:
+            new_position = add_vector(head, moves[move])
+            if new_position in occupied:
+                continue
+
+            gained = 0
+            neighbors = []
+            for step in moves.values():
+                j = occupied.get(add_vector(new_position, step))
+                if j is not None:
+                    neighbors.append(j)
+                    if is_h[k] and j != k - 1 and is_h[j]:
+                        gained += 1
+            children.append((gained, move, new_position, neighbors))
+
+        children.sort(key=lambda child: -child[0])
+
+        for gained, move, new_position, neighbors in children:
+            # Placing bead k takes one free neighbor from each adjacent placed H bead
+            for j in neighbors:
+                if is_h[j]:
+                    free[j % 2] -= 1
+            own_free = 4 - len(neighbors) if is_h[k] else 0
+            free[k % 2] += own_free
+
+            occupied[new_position] = k
+            path.append(new_position)
+
+            grow(k + 1, contacts + gained, first_turn_done or move == "U")
+
+            path.pop()
+            del occupied[new_position]
+
+            free[k % 2] -= own_free
+            for j in neighbors:
+                if is_h[j]:
+                    free[j % 2] += 1
+
+    grow(2, 0, False)
+
+    return 0 - Epsilon * best[0], lowest_paths
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python3 ground_state.py <sequence>")
+        sys.exit()
+
+    Epsilon = 1
+    sequence = sys.argv[1]
+
+    start = time.perf_counter()
+    min_energy, lowest_paths = ground_states(sequence, Epsilon)
+    elapsed = time.perf_counter() - start
+
+    print("Sequence =", sequence)
+    print("Lowest energy =", min_energy)
+    print("Number of lowest-energy microstates =", len(lowest_paths))
+    print("Search time (s) =", elapsed)
+
+    for i in range(len(lowest_paths)):
+        print("State", i + 1, "=", lowest_paths[i])
@@ -0,0 +1,182 @@
+import csv
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import MC
+
+"""
+Optional instrumentation for the MC loop in MC.py.
+
+Pass a Profiler as the profiler argument of MC.run_mc or MC.run_chain.
+The loop then uses Profiler.mc_step, which times proposal, energy
+evaluation (MC.score_move) and acceptance (MC.metropolis) separately,
+and frames going to sinks are timed as I/O. Without a profiler the plain mc_step is used, so the
+default loop pays nothing for this module.
+"""
+
+class Profiler:
+    """
+    Collects timings and rolling acceptance statistics of an MC run.
+
+    Parameters
+    ----------
+    window : int
+        Number of steps per rolling window for rates and throughput
+    """
+
+    def __init__(self, window=10000):
+        self.window = window
+        self.clock = time.perf_counter
+
+        self.times = {"proposal": 0.0, "energy": 0.0, "acceptance": 0.0, "io": 0.0}
+        self.move_times = Counter()
+        self.move_counts = Counter()
+
+        self.n_steps = 0
+        self.accepted = 0
+        self.invalid = 0
+        self.start_time = None
+        self.end_time = None
+
+        self.windows = []
+        self._window_steps = 0
+        self._window_accepted = 0
+        self._window_invalid = 0
+        self._window_start = None
+
+    def mc_step(self, chain, Beta, move, rng, bias=None):
+        """
+        MC.mc_step with the proposal, MC.score_move and MC.metropolis
+        phases timed separately.
+        """
+        clock = self.clock
+        t0 = clock()
+        if self.start_time is None:
+            self.start_time = t0
+            self._window_start = t0
+
+        undo = move(chain, rng)
+        t1 = clock()
+
+        name = move.__name__
+        self.move_times[name] += t1 - t0
+        self.move_counts[name] += 1
+        self.times["proposal"] += t1 - t0
+
+        if undo is None:
+            accepted, valid_move = False, False
+            t3 = t1
+        else:
+            trial = MC.score_move(chain, bias)
+            t2 = clock()
+            self.times["energy"] += t2 - t1
+
+            accepted, valid_move = MC.metropolis(chain, Beta, undo, trial, rng), True
+            t3 = clock()
+            self.times["acceptance"] += t3 - t2
+
+        self._count(accepted, valid_move, t3)
+        return accepted, valid_move
+
+    def _count(self, accepted, valid_move, now):
+        self.n_steps += 1
+        self.accepted += accepted
+        self.invalid += not valid_move
+        self.end_time = now
+
+        self._window_steps += 1
+        self._window_accepted += accepted
+        self._window_invalid += not valid_move
+
+        if self._window_steps == self.window:
+            self._close_window(now)
+
+    def _window_row(self, now):
+        elapsed = now - self._window_start
+        return {
+            "end_step": self.n_steps,
+            "steps": self._window_steps,
+            "seconds": elapsed,
+            "steps_per_second": self._window_steps / elapsed if elapsed > 0 else None,
+            "acceptance_rate": self._window_accepted / self._window_steps,
+            "invalid_rate": self._window_invalid / self._window_steps
+        }
+
+    def _close_window(self, now):
+        self.windows.append(self._window_row(now))
+        self._window_steps = 0
+        self._window_accepted = 0
+        self._window_invalid = 0
+        self._window_start = now
+
+    def rolling_windows(self):
+        """
+        Closed windows, plus the steps since the last one as a shorter
+        final window, so no step of the run is left out.
+        """
+        if self._window_steps:
+            return self.windows + [self._window_row(self.end_time)]
+        return list(self.windows)
+
+    @contextmanager
+    def section(self, name):
+        """
+        Time a block of code under the given category, e.g. "io".
+        """
+        t0 = self.clock()
+        try:
+            yield
+        finally:
+            self.times[name] = self.times.get(name, 0.0) + self.clock() - t0
+
+    def timed_sink(self, sink):
+        """
+        Wrap a sink so the time spent writing frames counts as I/O.
+        """
+        if sink is None:
+            return None
+
+        def timed(step, path, energy):
+            t0 = self.clock()
+            sink(step, path, energy)
+            self.times["io"] += self.clock() - t0
+
+        return timed
+
+    def summary(self):
+        """
+        Totals, throughput, time split and rolling windows as a dict.
+        """
+        wall = (self.end_time - self.start_time) if self.start_time is not None else 0.0
+        measured = sum(self.times.values())
+
+        return {
+            "n_steps": self.n_steps,
+            "wall_seconds": wall,
+            "steps_per_second": self.n_steps / wall if wall > 0 else None,
+            "acceptance_rate": self.accepted / self.n_steps if self.n_steps else None,
+            "invalid_rate": self.invalid / self.n_steps if self.n_steps else None,
+            "seconds": dict(self.times),
+            "fractions": {k: v / measured for k, v in self.times.items()} if measured else {},
+            "move_seconds": dict(self.move_times),
+            "move_counts": dict(self.move_counts),
+            "windows": self.rolling_windows()
+        }
+
+    def export_json(self, filename):
+        with open(filename, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def export_csv(self, filename):
+        """
+        Write the rolling windows as CSV, one row per window, the last
+        one possibly shorter.
+        """
+        fields = ["end_step", "steps", "seconds", "steps_per_second", "acceptance_rate", "invalid_rate"]
+        with open(filename, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for row in self.rolling_windows():
+                writer.writerow(row)
@@ -1,6 +1,7 @@
 import enumeration
 import analysis
 import restrained_analysis
+import restraint_sweep
 import sys
 
 sequence = sys.argv[1]
@@ -46,16 +47,22 @@ for i in range(len(lowest_paths)):
     print("State", i + 1, "=", lowest_paths[i])
 
 with open("trajectory_unrestrained.txt", "w") as f:
-    for i, path in enumerate(all_paths, 1):
-        energy = analysis.hp_contacts(path, sequence, Epsilon)
+    energies = analysis.energies_of_paths(all_paths, sequence, Epsilon)
+    for i, (path, energy) in enumerate(zip(all_paths, energies), 1):
         f.write(f"Path {i}: {path} Energy = {energy}\n")
         
 # -----------------------------
 # Restrained systems
 # -----------------------------
+# One pass collapses the paths into a joint (contacts, d_ij) histogram;
+# every k_force below is then evaluated from its bins
+joint = restraint_sweep.joint_histograms(all_paths, sequence, [(bead_i, bead_j)])[(bead_i, bead_j)]
+
 for k_force in k_values:
-    restrained_results = restrained_analysis.analyze_paths_with_restraint(all_paths, sequence, kT, Epsilon, bead_i, bead_j, k_force)
-    min_energy_r, lowest_paths_r, degeneracy_r = restrained_analysis.lowest_energy_microstates_with_restraint(all_paths, sequence, Epsilon, bead_i, bead_j, k_force)
+    restrained_results = restraint_sweep.restrained_results(joint, Epsilon, kT, k_force)
+    min_energy_r = restrained_results["min_energy"]
+    degeneracy_r = restrained_results["degeneracy"]
+    lowest_paths_r = restraint_sweep.lowest_energy_paths(all_paths, sequence, bead_i, bead_j, restrained_results["ground_bins"])
 
     print("\n==================================================")
     print(f"RESTRAINED SYSTEM  (k = {k_force})")
@@ -88,16 +95,13 @@ for k_force in k_values:
         print("State", i + 1, "=", lowest_paths_r[i])
 
     print()
-    
-
-    all_paths = enumeration.enumerate_paths(sequence)
 
-    with open("trajectory_all_k.txt", "w") as f:
-         for k_force in k_values:
-             f.write(f"===== k_force = {k_force} =====\n\n")
+with open("trajectory_all_k.txt", "w") as f:
+    for k_force in k_values:
+        f.write(f"===== k_force = {k_force} =====\n\n")
 
-             for step, path in enumerate(all_paths, 1):
-                 restraint_energy = restrained_analysis.calculate_energy_with_restraint(sequence, path, Epsilon, bead_i, bead_j, k_force)
-                 f.write(f"Path {step}: {path} Energy = {restraint_energy}\n")
+        restraint_energies, _ = restrained_analysis.batch_energies_with_restraint(all_paths, sequence, Epsilon, bead_i, bead_j, k_force)
+        for step, (path, restraint_energy) in enumerate(zip(all_paths, restraint_energies.tolist()), 1):
+            f.write(f"Path {step}: {path} Energy = {restraint_energy}\n")
 
-             f.write("\n")
+        f.write("\n")
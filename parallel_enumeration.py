@@ -0,0 +1,121 @@
+import os
+import sys
+from multiprocessing import Pool
+
+from analysis import analyze_histogram, merge_histograms
+from enumeration import energy_histogram, iter_paths
+from MC import load_checkpoint, save_checkpoint
+
+"""
+Exhaustive enumeration split over a process pool.
+
+All walks are grouped by their first prefix_length beads. Every prefix
+is the root of an independent subtree, which a worker folds into an
+energy histogram with enumeration.energy_histogram. The shard results
+are merged in prefix order, so the result does not depend on the number
+of processes or on which shard finished first.
+
+With a shard directory, every finished shard is saved to its own file
+and skipped when the enumeration is started again, so an interrupted
+run only redoes the shards that were in progress.
+"""
+
+def shard_prefixes(n, prefix_length):
+    """
+    All walks of prefix_length beads (capped at n), in enumeration order.
+    """
+    return list(iter_paths("P" * min(n, prefix_length)))
+
+def shard_file(shard_dir, index):
+    return os.path.join(shard_dir, f"shard_{index:06d}.pkl")
+
+def run_shard(args):
+    """
+    Worker: histogram of all walks that start with one prefix.
+    """
+    sequence, Epsilon, index, prefix, shard_dir = args
+
+    if shard_dir is not None:
+        filename = shard_file(shard_dir, index)
+        if os.path.exists(filename):
+            state = load_checkpoint(filename)
+            if (state["sequence"], state["Epsilon"], state["prefix"]) != (sequence, Epsilon, prefix):
+                raise ValueError(f"Shard file {filename} is for a different enumeration")
+            return index, state["histogram"]
+
+    histogram = energy_histogram(sequence, Epsilon, prefix)
+
+    if shard_dir is not None:
+        save_checkpoint(filename, {
+            "sequence": sequence,
+            "Epsilon": Epsilon,
+            "prefix": prefix,
+            "histogram": histogram
+        })
+
+    return index, histogram
+
+def parallel_energy_histogram(sequence, Epsilon, prefix_length=8, processes=None, shard_dir=None):
+    """
+    Same histogram as enumeration.energy_histogram, computed in parallel.
+
+    Parameters
+    ----------
+    sequence : str
+        HP sequence
+    Epsilon : float
+        H-H contact strength
+    prefix_length : int
+        Beads fixed per shard; 8 gives a few hundred shards
+    processes : int or None
+        Worker processes (default: all cores)
+    shard_dir : str or None
+        Directory for per-shard result files, to make the run resumable
+
+    Returns
+    -------
+    histogram : dict
+        Energy -> {"count", "sum_rg", "sum_rg2", "sum_end2end"}
+    """
+    prefixes = shard_prefixes(len(sequence), prefix_length)
+
+    if shard_dir is not None:
+        os.makedirs(shard_dir, exist_ok=True)
+
+    tasks = [(sequence, Epsilon, i, prefix, shard_dir) for i, prefix in enumerate(prefixes)]
+
+    shards = [None] * len(tasks)
+    with Pool(processes) as pool:
+        for index, histogram in pool.imap_unordered(run_shard, tasks):
+            shards[index] = histogram
+
+    return merge_histograms(shards)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 parallel_enumeration.py <sequence> [prefix_length] [shard_dir]")
+        sys.exit()
+
+    Epsilon = 1
+    kT = 0.6
+
+    sequence = sys.argv[1]
+    prefix_length = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    shard_dir = sys.argv[3] if len(sys.argv) > 3 else None
+
+    histogram = parallel_energy_histogram(sequence, Epsilon, prefix_length, shard_dir=shard_dir)
+    results = analyze_histogram(histogram, kT)
+
+    print("Sequence =", sequence)
+    print("Number of conformations =", results["n_paths"])
+    print("Partition function =", results["Z"])
+    print("Average radius of gyration =", results["avg_rg"])
+    print("Average end-to-end distance =", results["average_end2end"])
+    print("Average energy =", results["average_energy"])
+    print("Heat capacity =", results["Cv"])
+    print("Entropy S1 =", results["S1"])
+    print("Entropy S2 =", results["S2"])
+
+    print("\nMacrostates (Energy : Degeneracy)")
+    for energy in sorted(results["macrostates"]):
+        print(f"{energy} : {results['macrostates'][energy]}")
@@ -0,0 +1,156 @@
+import math
+import random
+import sys
+from collections import Counter
+from multiprocessing import Pool
+
+from MC import Chain, run_chain, straight_path
+
+"""
+Replica exchange (parallel tempering) for the HP lattice model.
+
+One replica runs at each temperature of a ladder. Each round, every
+replica runs a run_chain segment in a worker process; then neighboring
+temperatures try to swap configurations with the Metropolis criterion
+    P = min(1, exp[(Beta_i - Beta_j) (E_i - E_j)])
+so that low-temperature replicas can escape compact H-core traps.
+"""
+
+# Same ladder as plot.py
+default_temperatures = [0.6, 0.8, 1.0, 1.2, 1.5, 2.0, 3.0, 4.0, 5.0]
+
+def run_segment(args):
+    """
+    Worker: advance one replica by n_steps and collect energy statistics.
+
+    Returns the new path and energy, move counters, and the sums needed
+    for <E>, <E^2> and the macrostate histogram at this temperature.
+    """
+    sequence, path, n_steps, Beta, Epsilon, seed, stride = args
+
+    chain = Chain(path, sequence, Epsilon)
+
+    stats = {"n": 0, "sum_E": 0.0, "sum_E2": 0.0, "macrostates": Counter()}
+
+    def collect(step, path, energy):
+        stats["n"] += 1
+        stats["sum_E"] += energy
+        stats["sum_E2"] += energy * energy
+        stats["macrostates"][energy] += 1
+
+    accepted, invalid = run_chain(chain, n_steps, Beta, collect, stride, rng=random.Random(seed))
+
+    return chain.path(), chain.energy, accepted, invalid, stats
+
+def run_parallel_tempering(sequence, temperatures, n_rounds, steps_per_round, Epsilon,
+                           seed=0, stride=1, processes=None):
+    """
+    Run replica exchange over a temperature ladder.
+
+    Parameters
+    ----------
+    sequence : str
+        HP sequence
+    temperatures : list of float
+        kT of each replica, in increasing order
+    n_rounds : int
+        Number of segment + swap rounds
+    steps_per_round : int
+        MC steps each replica runs between swap attempts
+    Epsilon : float
+        H-H contact strength
+    seed : int
+        Master seed; segment seeds and swap decisions are drawn from it
+    stride : int
+        Sample energies every stride-th step within a segment
+    processes : int or None
+        Worker processes (default: all cores)
+
+    Returns
+    -------
+    results : dict
+        kT, average_energy and Cv per temperature, swap_acceptance per
+        neighboring pair, move acceptance ratio per temperature,
+        macrostates per temperature, and the final path at each temperature.
+    """
+    Betas = [1.0 / kT for kT in temperatures]
+    n_replicas = len(temperatures)
+    rng = random.Random(seed)
+
+    paths = [straight_path(sequence) for _ in range(n_replicas)]
+    energies = [0.0] * n_replicas
+
+    totals = [{"n": 0, "sum_E": 0.0, "sum_E2": 0.0, "macrostates": Counter()}
+              for _ in range(n_replicas)]
+    accepted_moves = [0] * n_replicas
+    swap_attempts = [0] * (n_replicas - 1)
+    swap_accepted = [0] * (n_replicas - 1)
+
+    with Pool(processes) as pool:
+        for round_index in range(n_rounds):
+            tasks = [
+                (sequence, paths[t], steps_per_round, Betas[t], Epsilon, rng.getrandbits(64), stride)
+                for t in range(n_replicas)
+            ]
+
+            for t, (path, energy, accepted, invalid, stats) in enumerate(pool.map(run_segment, tasks)):
+                paths[t] = path
+                energies[t] = energy
+                accepted_moves[t] += accepted
+                totals[t]["n"] += stats["n"]
+                totals[t]["sum_E"] += stats["sum_E"]
+                totals[t]["sum_E2"] += stats["sum_E2"]
+                totals[t]["macrostates"].update(stats["macrostates"])
+
+            # Alternate even and odd pairs so every pair is tried every two rounds
+            for t in range(round_index % 2, n_replicas - 1, 2):
+                swap_attempts[t] += 1
+                x = (Betas[t] - Betas[t + 1]) * (energies[t] - energies[t + 1])
+                if x >= 0 or rng.random() < math.exp(x):
+                    swap_accepted[t] += 1
+                    paths[t], paths[t + 1] = paths[t + 1], paths[t]
+                    energies[t], energies[t + 1] = energies[t + 1], energies[t]
+
+    average_energy = []
+    Cv = []
+    for kT, total in zip(temperatures, totals):
+        avg_E = total["sum_E"] / total["n"]
+        avg_E2 = total["sum_E2"] / total["n"]
+        average_energy.append(avg_E)
+        Cv.append((avg_E2 - avg_E * avg_E) / (kT * kT))
+
+    results = {
+        "kT": list(temperatures),
+        "average_energy": average_energy,
+        "Cv": Cv,
+        "macrostates": [total["macrostates"] for total in totals],
+        "acceptance_ratio": [a / (n_rounds * steps_per_round) for a in accepted_moves],
+        "swap_acceptance": [a / n if n else 0.0 for a, n in zip(swap_accepted, swap_attempts)],
+        "final_paths": paths
+    }
+
+    return results
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Usage: python3 parallel_tempering.py <sequence> <n_rounds> <steps_per_round>")
+        sys.exit()
+
+    Epsilon = 1
+
+    sequence = sys.argv[1]
+    n_rounds = int(sys.argv[2])
+    steps_per_round = int(sys.argv[3])
+
+    results = run_parallel_tempering(sequence, default_temperatures, n_rounds, steps_per_round, Epsilon)
+
+    print("Sequence =", sequence)
+    print()
+    print("Temperature    Average_E    Cv    Acceptance")
+    for i, kT in enumerate(results["kT"]):
+        print(kT, "   ", results["average_energy"][i], "   ", results["Cv"][i], "   ", results["acceptance_ratio"][i])
+
+    print()
+    print("Swap acceptance (kT_i <-> kT_i+1)")
+    for i, rate in enumerate(results["swap_acceptance"]):
+        print(results["kT"][i], "<->", results["kT"][i + 1], ":", rate)
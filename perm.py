@@ -0,0 +1,197 @@
+import math
+import random
+import sys
+
+from analysis import end_to_end, radius_of_gyration
+from enumeration import moves, add_vector
+
+"""
+Pruned-enriched Rosenbluth method (PERM) for long HP chains.
+
+Chains are grown bead by bead as in enumeration.enumerate_paths, but
+instead of trying every continuation one free site is picked with
+probability proportional to its Boltzmann factor, and the chain weight is
+multiplied by the sum of those factors (Rosenbluth weighting). Chains whose
+weight is far above the running estimate of Z at that length are copied
+(enriched), chains far below it are killed with probability 1/2 (pruned).
+
+The first bond is fixed to (0,0) -> (1,0), so estimated Z counts every walk
+with that first bond. enumerate_paths also fixes the first turn to be
+upward; for the same chain Z_perm = 2 * Z_enum - exp(-E_straight / kT).
+"""
+
+def contact_gain(sequence, visited, site, k, Epsilon):
+    """
+    Energy change from putting bead k on site, given the beads in visited.
+    """
+    if sequence[k] != "H":
+        return 0
+
+    E = 0
+    for step in moves.values():
+        other = visited.get(add_vector(site, step))
+        if other is not None and other < k - 1 and sequence[other] == "H":
+            E -= Epsilon
+    return E
+
+def run_perm(sequence, kT, Epsilon, n_tours, c_plus=3.0, c_minus=0.3, max_samples=100000,
+             rng=None):
+    """
+    Sample HP conformations with PERM.
+
+    Parameters
+    ----------
+    sequence : str
+        HP sequence
+    kT : float
+        Temperature
+    Epsilon : float
+        H-H contact strength
+    n_tours : int
+        Number of chains started from the first bond
+    c_plus, c_minus : float
+        Enrichment and pruning thresholds relative to the running Z estimate
+    max_samples : int
+        At most this many full-length samples are kept (all of them still
+        enter Z and the averages)
+    rng : random.Random or None
+        Random number stream (default: the global random module)
+
+    Returns
+    -------
+    results : dict
+        "Z" (estimate of the partition function at full length),
+        "average_energy", "average_rg", "average_end2end" (weighted),
+        "min_energy" and "lowest_paths" (distinct lowest-energy paths found),
+        "samples" (list of (path, weight, energy)) and "n_samples"
+        (number of full-length chains grown).
+    """
+    n = len(sequence)
+    if rng is None:
+        rng = random
+
+    # Running sums of weights per length, for the Z_k estimates
+    weight_sums = [0.0] * (n + 1)
+    tours = 0
+
+    totals = {"W": 0.0, "E": 0.0, "rg": 0.0, "ree": 0.0, "n": 0}
+    samples = []
+    lowest = {"E": math.inf, "paths": set()}
+
+    path = [(0, 0), (1, 0)]
+    visited = {(0, 0): 0, (1, 0): 1}
+
+    def record(weight, energy):
+        totals["W"] += weight
+        totals["E"] += weight * energy
+        totals["rg"] += weight * radius_of_gyration(path)
+        totals["ree"] += weight * end_to_end(path)
+        totals["n"] += 1
+
+        if len(samples) < max_samples:
+            samples.append((path.copy(), weight, energy))
+
+        if energy < lowest["E"]:
+            lowest["E"] = energy
+            lowest["paths"] = set()
+        if energy == lowest["E"]:
+            lowest["paths"].add(tuple(path))
+
+    def grow(weight, energy):
+        k = len(path)
+        weight_sums[k] += weight
+
+        if k == n:
+            record(weight, energy)
+            return
+
+        Z_k = weight_sums[k] / tours
+
+        if weight > c_plus * Z_k:
+            # Enrich: continue two copies, each with half the weight
+            copies = 2
+            weight /= 2
+        elif weight < c_minus * Z_k:
+            # Prune with probability 1/2, survivors carry double weight
+            if rng.random() < 0.5:
+                return
+            copies = 1
+            weight *= 2
+        else:
+            copies = 1
+
+        head = path[-1]
+        for _ in range(copies):
+            options = []
+            for step in moves.values():
+                site = add_vector(head, step)
+                if site not in visited:
+                    dE = contact_gain(sequence, visited, site, k, Epsilon)
+                    options.append((site, dE, math.exp(-dE / kT)))
+
+            if not options:
+                continue
+
+            rosenbluth = sum(b for _, _, b in options)
+            r = rng.random() * rosenbluth
+            for site, dE, b in options:
+                r -= b
+                if r < 0:
+                    break
+
+            visited[site] = k
+            path.append(site)
+            grow(weight * rosenbluth, energy + dE)
+            path.pop()
+            del visited[site]
+
+    if n <= 2:
+        n_tours = 1
+
+    for _ in range(n_tours):
+        tours += 1
+        if n == 1:
+            path[:] = [(0, 0)]
+            weight_sums[1] += 1.0
+            record(1.0, 0)
+            continue
+        grow(1.0, 0)
+
+    W = totals["W"]
+
+    results = {
+        "Z": weight_sums[n] / tours,
+        "average_energy": totals["E"] / W if W else math.nan,
+        "average_rg": totals["rg"] / W if W else math.nan,
+        "average_end2end": totals["ree"] / W if W else math.nan,
+        "min_energy": lowest["E"],
+        "lowest_paths": [list(p) for p in sorted(lowest["paths"])],
+        "samples": samples,
+        "n_samples": totals["n"]
+    }
+
+    return results
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python3 perm.py <sequence> <n_tours> [kT]")
+        sys.exit()
+
+    Epsilon = 1
+
+    sequence = sys.argv[1]
+    n_tours = int(sys.argv[2])
+    kT = float(sys.argv[3]) if len(sys.argv) > 3 else 0.6
+
+    sys.setrecursionlimit(max(1000, 4 * len(sequence)))
+    results = run_perm(sequence, kT, Epsilon, n_tours)
+
+    print("Sequence =", sequence)
+    print("kT =", kT)
+    print("Full-length chains grown =", results["n_samples"])
+    print("Partition function (first bond fixed) =", results["Z"])
+    print("Average energy =", results["average_energy"])
+    print("Average radius of gyration =", results["average_rg"])
+    print("Average end-to-end distance =", results["average_end2end"])
+    print("Lowest energy found =", results["min_energy"])
+    print("Number of lowest-energy paths found =", len(results["lowest_paths"]))
@@ -1,46 +1,25 @@
-import math
 import matplotlib.pyplot as plt
-import enumeration
-import analysis
+import numpy as np
 import sys
 
+from contact_cache import load_walk_cache
+from temperature_sweep import cv_peaks, temperature_sweep
+
 Epsilon = 1
 sequence = sys.argv[1]
 
 temperatures = [0.6, 0.8, 1.0, 1.2, 1.5, 2.0, 3.0, 4.0, 5.0]
 
-def calculate_Cv(paths, sequence, Epsilon, kT):
-    Z = 0.0
-    avg_E = 0.0
-    avg_E2 = 0.0
-
-    for path in paths:
-        energy = analysis.hp_contacts(path, sequence, Epsilon)
-        weight = math.exp(-energy / kT)
-
-        Z += weight
-        avg_E += energy * weight
-        avg_E2 += energy * energy * weight
-
-    avg_E /= Z
-    avg_E2 /= Z
+# One pass over the walks, then every temperature is almost free
+histogram = load_walk_cache(len(sequence)).histogram(sequence, Epsilon)
 
-    Cv = (avg_E2 - avg_E * avg_E) / (kT * kT)
-    return Cv
+sweep = temperature_sweep(histogram, temperatures)
+T_values = list(sweep["kT"])
+Rg_values = list(sweep["avg_rg"])
+Cv_values = list(sweep["Cv"])
 
-paths = enumeration.enumerate_paths(sequence)
-
-T_values = []
-Rg_values = []
-Cv_values = []
-
-for kT in temperatures:
-    avg_rg = analysis.average_rg(paths, sequence, Epsilon, kT)
-    Cv = calculate_Cv(paths, sequence, Epsilon, kT)
-
-    T_values.append(kT)
-    Rg_values.append(avg_rg)
-    Cv_values.append(Cv)
+fine = temperature_sweep(histogram, np.linspace(min(temperatures), max(temperatures), 1000))
+peaks = cv_peaks(histogram)
 
 print("Sequence =", sequence)
 print()
@@ -50,9 +29,13 @@ for i in range(len(T_values)):
     print(T_values[i], "   ", Rg_values[i], "   ", Cv_values[i])
 
 print()
+for kT, Cv in peaks:
+    print("Cv peak at kT =", kT, " Cv =", Cv)
+print()
 
 plt.figure()
-plt.plot(T_values, Rg_values, marker='o')
+plt.plot(fine["kT"], fine["avg_rg"])
+plt.plot(T_values, Rg_values, marker='o', linestyle='none')
 plt.xlabel("Temperature (kT)")
 plt.ylabel("Average Radius of Gyration")
 plt.title("Average Rg vs Temperature for " + sequence)
@@ -61,7 +44,11 @@ plt.savefig(sequence + "_Rg_vs_T.png")
 plt.close()
 
 plt.figure()
-plt.plot(T_values, Cv_values, marker='o')
+plt.plot(fine["kT"], fine["Cv"])
+plt.plot(T_values, Cv_values, marker='o', linestyle='none')
+for kT, Cv in peaks:
+    if min(temperatures) <= kT <= max(temperatures):
+        plt.axvline(kT, linestyle='--', color='gray')
 plt.xlabel("Temperature (kT)")
 plt.ylabel("Cv")
 plt.title("Cv vs Temperature for " + sequence)
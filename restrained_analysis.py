@@ -1,5 +1,8 @@
 from collections import Counter
 import math
+
+import numpy as np
+
 import analysis
 
 
@@ -28,12 +31,31 @@ def calculate_energy_with_restraint(sequence, path, Epsilon, bead_i, bead_j, k_f
     return hp_energy + restraint_energy
 
 
+def restraint_energies(d, k_force):
+    """
+    calculate_restraint_energy for an array of Manhattan distances d.
+    """
+    d = np.asarray(d)
+    return np.where(d == 1, 0.0, k_force * (d - 1.0) ** 2)
+
+
+def batch_energies_with_restraint(paths, sequence, Epsilon, bead_i, bead_j, k_force):
+    """
+    Restrained energies of all paths in one analysis.batch_properties pass.
+
+    Returns the energy array and the batch_properties dict.
+    """
+    props = analysis.batch_properties(paths, sequence, Epsilon, bead_pairs=[(bead_i, bead_j)])
+    E = props["energy"] + restraint_energies(props["distance"][:, 0], k_force)
+    return E, props
+
+
 def partition_function_with_restraint(paths, sequence, kT, Epsilon, bead_i, bead_j, k_force):
-    Z = 0.0
-    for path in paths:
-        E = calculate_energy_with_restraint(sequence, path, Epsilon, bead_i, bead_j, k_force)
-        Z += math.exp(-E/kT)
-    return Z
+    E, _ = batch_energies_with_restraint(paths, sequence, Epsilon, bead_i, bead_j, k_force)
+    try:
+        return math.exp(analysis.log_partition_function(E, kT))
+    except OverflowError:
+        return math.inf
 
 
 def probability_with_restraint(path, sequence, Z, kT, Epsilon, bead_i, bead_j, k_force):
@@ -47,64 +69,50 @@ def entropy_term_with_restraint(path, sequence, Z, kT, Epsilon, bead_i, bead_j,
 
 
 def restrained_macrostates_by_energy(paths, sequence, Epsilon, bead_i, bead_j, k_force):
-    energies = []
-    for path in paths:
-        E = calculate_energy_with_restraint(sequence, path, Epsilon, bead_i, bead_j, k_force)
-        energies.append(E)
-    return Counter(energies)
+    E, _ = batch_energies_with_restraint(paths, sequence, Epsilon, bead_i, bead_j, k_force)
+    return Counter(E.tolist())
 
 
 def lowest_energy_microstates_with_restraint(paths, sequence, Epsilon, bead_i, bead_j, k_force):
-    energies = []
-
-    for path in paths:
-        E = calculate_energy_with_restraint(sequence, path, Epsilon, bead_i, bead_j, k_force)
-        energies.append((E, path))
+    E, _ = batch_energies_with_restraint(paths, sequence, Epsilon, bead_i, bead_j, k_force)
 
-    min_energy = min(E for E, _ in energies)
-    lowest_paths = [path for E, path in energies if E == min_energy]
+    min_energy = E.min().item()
+    lowest_paths = [paths[i] for i in np.flatnonzero(E == min_energy)]
     degeneracy = len(lowest_paths)
 
     return min_energy, lowest_paths, degeneracy
 
 
 def analyze_paths_with_restraint(paths, sequence, kT, Epsilon, bead_i, bead_j, k_force):
-    Z = partition_function_with_restraint(paths, sequence, kT, Epsilon, bead_i, bead_j, k_force)
-
-    sum_end2end = 0.0
-    sum_rg = 0.0
-    average_end2end = 0.0
-    average_rg = 0.0
-    average_energy = 0.0
-    entropy1 = 0.0
-    energies = []
-
-    for path in paths:
-        E = calculate_energy_with_restraint(sequence, path, Epsilon, bead_i, bead_j, k_force)
-        p = probability_with_restraint(path, sequence, Z, kT, Epsilon, bead_i, bead_j, k_force)
-
-        ree = analysis.end_to_end(path)
-        rg = analysis.calculate_radius_of_gyration(path)
-        sum_end2end += ree
-        sum_rg += rg
-        average_end2end += p * ree
-        average_rg += p * rg
-        average_energy += p * E
-        entropy1 -= entropy_term_with_restraint(path, sequence, Z, kT, Epsilon, bead_i, bead_j, k_force)
-        energies.append(E)
-
-    macro = Counter(energies)
+    """
+    Restrained counterpart of analysis.analyze_paths.
+
+    Every path is scored once, and Z and the averages are computed with
+    log-sum-exp weights. "avg_rg" is the plain mean over paths and
+    "average_rg" the Boltzmann average.
+    """
+    E, props = batch_energies_with_restraint(paths, sequence, Epsilon, bead_i, bead_j, k_force)
+
+    p, ln_Z = analysis.boltzmann_weights(E, kT)
+
+    try:
+        Z = math.exp(ln_Z)
+    except OverflowError:
+        Z = math.inf
+
+    average_energy = float(p @ E)
 
     results = {
         "Z": Z,
+        "ln_Z": ln_Z,
         "n_paths": len(paths),
-        "avg_rg": sum_rg / len(paths),
-        "average_end2end": average_end2end,
-        "average_rg": average_rg,
+        "avg_rg": float(props["rg"].mean()),
+        "average_end2end": float(p @ props["end2end"]),
+        "average_rg": float(p @ props["rg"]),
         "average_energy": average_energy,
-        "S1": entropy1,
-        "S2": analysis.entropy_from_definition(average_energy, Z, kT),
-        "macrostates": macro
+        "S1": float(-(p * (-E / kT - ln_Z)).sum()),
+        "S2": average_energy / kT + ln_Z,
+        "macrostates": Counter(E.tolist())
     }
 
-    return results
\ No newline at end of file
+    return results
@@ -0,0 +1,185 @@
+import math
+import sys
+from collections import Counter
+
+import numpy as np
+
+import analysis
+from contact_cache import load_walk_cache
+from enumeration import new_histogram_bin
+
+"""
+Restraint sweeps from a joint histogram of H-H contacts and d_ij.
+
+The restrained energy of restrained_analysis depends on a conformation
+only through its number of H-H contacts c and the Manhattan distance d
+between the restrained beads i and j:
+    E = E_HP(c) + k (d - 1)^2   (0 when d == 1)
+One pass over the conformations therefore collapses them into a joint
+histogram over (c, d) with per-bin sums of Rg and end-to-end distance,
+for one or every bead pair. Thermodynamics, ground-state energies and
+degeneracies then follow for any spring constant and kT from a handful
+of bins, which makes a full (i, j) x k restraint map affordable.
+"""
+
+def all_bead_pairs(n):
+    """
+    Every pair (i, j) with j >= i + 2 (bonded beads are always at d = 1).
+    """
+    return [(i, j) for i in range(n) for j in range(i + 2, n)]
+
+def joint_histograms(conformations, sequence, bead_pairs=None, chunk_size=100000):
+    """
+    Joint (contacts, d_ij) histograms for each bead pair, in one pass.
+
+    Parameters
+    ----------
+    conformations : list of paths, coordinate array, or packed bonds
+        Anything analysis.batch_properties accepts, e.g. the bonds of a
+        contact_cache.WalkCache
+    sequence : str
+        HP sequence
+    bead_pairs : list of (i, j) or None
+        Restrained pairs (default: all_bead_pairs)
+    chunk_size : int
+        Conformations per vectorized pass
+
+    Returns
+    -------
+    joints : dict
+        (i, j) -> {(contacts, d): {"count", "sum_rg", "sum_rg2", "sum_end2end"}}
+    """
+    n = len(sequence)
+    if bead_pairs is None:
+        bead_pairs = all_bead_pairs(n)
+
+    # Distances are at most n - 1, so (c, d) packs into c * n + d
+    counts = [Counter() for _ in bead_pairs]
+    sums = [{"sum_rg": Counter(), "sum_rg2": Counter(), "sum_end2end": Counter()} for _ in bead_pairs]
+
+    for start in range(0, len(conformations), chunk_size):
+        props = analysis.batch_properties(conformations[start:start + chunk_size], sequence, 1,
+                                          bead_pairs, chunk_size)
+        columns = {"sum_rg": props["rg"], "sum_rg2": props["rg"] ** 2, "sum_end2end": props["end2end"]}
+
+        for p in range(len(bead_pairs)):
+            keys, inverse = np.unique(props["contacts"] * n + props["distance"][:, p], return_inverse=True)
+            for key, count in zip(keys.tolist(), np.bincount(inverse).tolist()):
+                counts[p][key] += count
+            for name, values in columns.items():
+                for key, total in zip(keys.tolist(), np.bincount(inverse, weights=values).tolist()):
+                    sums[p][name][key] += total
+
+    joints = {}
+    for p, pair in enumerate(bead_pairs):
+        joint = {}
+        for key in sorted(counts[p]):
+            b = new_histogram_bin()
+            b["count"] = counts[p][key]
+            for name in sums[p]:
+                b[name] = sums[p][name][key]
+            joint[divmod(key, n)] = b
+        joints[pair] = joint
+
+    return joints
+
+def bin_energy(c, d, Epsilon, k_force):
+    """
+    Restrained energy of a (contacts, d) bin, as calculate_energy_with_restraint.
+    """
+    restraint = 0.0 if d == 1 else k_force * (d - 1.0) ** 2
+    return analysis.contact_energies(c, Epsilon)[-1] + restraint
+
+def restrained_results(joint, Epsilon, kT, k_force):
+    """
+    Restrained thermodynamics of one bead pair from its joint histogram.
+
+    Returns the keys of restrained_analysis.analyze_paths_with_restraint,
+    plus min_energy, degeneracy (of the lowest restrained energy) and
+    ground_bins, the (contacts, d) bins holding the ground states.
+    """
+    bins = list(joint)
+    E = np.array([bin_energy(c, d, Epsilon, k_force) for c, d in bins])
+    g = np.array([joint[key]["count"] for key in bins], dtype=float)
+
+    # Bins are levels with degeneracies g for analysis.cumulants
+    ln_Z, p_bin, mean, _, _ = analysis.cumulants(E, np.log(g), kT)
+    ln_Z = float(ln_Z[0])
+    p_bin = p_bin[0]
+    p_state = p_bin / g
+
+    try:
+        Z = math.exp(ln_Z)
+    except OverflowError:
+        Z = math.inf
+
+    def weighted(name):
+        return float(p_state @ np.array([joint[key][name] for key in bins]))
+
+    average_energy = float(mean[0])
+    n_paths = int(g.sum())
+
+    min_energy = E.min().item()
+    ground = E == min_energy
+
+    macro = Counter()
+    for key, energy in zip(bins, E.tolist()):
+        macro[energy] += joint[key]["count"]
+
+    return {
+        "Z": Z,
+        "ln_Z": ln_Z,
+        "n_paths": n_paths,
+        "avg_rg": sum(b["sum_rg"] for b in joint.values()) / n_paths,
+        "average_end2end": weighted("sum_end2end"),
+        "average_rg": weighted("sum_rg"),
+        "average_energy": average_energy,
+        "S1": float(-(p_bin * (-E / kT - ln_Z)).sum()),
+        "S2": average_energy / kT + ln_Z,
+        "macrostates": macro,
+        "min_energy": min_energy,
+        "degeneracy": int(g[ground].sum()),
+        "ground_bins": [key for key, is_ground in zip(bins, ground) if is_ground]
+    }
+
+def lowest_energy_paths(paths, sequence, bead_i, bead_j, ground_bins):
+    """
+    The paths that fall in the ground-state bins of restrained_results.
+    """
+    props = analysis.batch_properties(paths, sequence, 1, [(bead_i, bead_j)])
+    keys = set(ground_bins)
+    return [paths[m] for m, (c, d) in enumerate(zip(props["contacts"].tolist(), props["distance"][:, 0].tolist()))
+            if (c, d) in keys]
+
+def restraint_map(joints, Epsilon, kT, k_values):
+    """
+    restrained_results for every bead pair in joints and every spring constant.
+
+    Returns a dict (i, j) -> {k_force: results}.
+    """
+    return {pair: {k_force: restrained_results(joint, Epsilon, kT, k_force) for k_force in k_values}
+            for pair, joint in joints.items()}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 restraint_sweep.py <sequence> [kT] [k1,k2,...]")
+        sys.exit()
+
+    Epsilon = 1
+
+    sequence = sys.argv[1]
+    kT = float(sys.argv[2]) if len(sys.argv) > 2 else 0.6
+    k_values = [float(k) for k in sys.argv[3].split(",")] if len(sys.argv) > 3 else [0.1, 0.5, 1.0]
+
+    cache = load_walk_cache(len(sequence))
+    joints = joint_histograms(cache.bonds, sequence)
+    results = restraint_map(joints, Epsilon, kT, k_values)
+
+    print("Sequence =", sequence)
+    print("kT =", kT)
+    print()
+    print("bead_i    bead_j    k    Z    Average_E    Average_Rg    Lowest_E    Degeneracy")
+    for (i, j), by_k in results.items():
+        for k_force, r in by_k.items():
+            print(i, "   ", j, "   ", k_force, "   ", r["Z"], "   ", r["average_energy"], "   ",
+                  r["average_rg"], "   ", r["min_energy"], "   ", r["degeneracy"])
@@ -0,0 +1,215 @@
+import sys
+from multiprocessing import Pool
+
+import numpy as np
+
+from contact_cache import contact_pairs, default_cache_dir, load_walk_cache
+
+"""
+Exhaustive scan of all 2^n HP sequences of one length.
+
+Every sequence is scored against all walks of the walk cache. Walks with
+the same contact map have the same energy for every sequence, so the
+maps are deduplicated first and weighted by their multiplicity. For a
+block of sequences, the H-H contact counts of all (map, sequence) pairs
+are then one matrix product of the contact matrix with the H-H pair
+masks, and the energy degeneracies follow from a few weighted sums.
+
+A sequence and its reverse have the same spectrum, so only sequences
+that are not larger than their reverse are scored.
+
+For each sequence the scan reports the ground-state energy and its
+degeneracy (as analysis.lowest_energy_microstates), the gap to the first
+excited level, the ground-state probability at a reference kT, and a
+folding-temperature proxy: the kT where the ground state has
+probability 1/2.
+"""
+
+def sequence_from_index(index, n):
+    """
+    Bead k is H if bit n-1-k of index is set, so index 0 is all P.
+    """
+    return "".join("H" if (index >> (n - 1 - k)) & 1 else "P" for k in range(n))
+
+def reverse_index(index, n):
+    return int(format(index, f"0{n}b")[::-1], 2)
+
+def canonical_indices(n):
+    """
+    Indices of the sequences that are not larger than their reverse.
+    """
+    return np.array([s for s in range(2 ** n) if s <= reverse_index(s, n)], dtype=np.int64)
+
+def unique_contact_maps(cache):
+    """
+    Distinct contact maps of the cached walks, as a float32 (U, pairs)
+    0/1 matrix, and how many walks have each of them.
+    """
+    pair_i, _ = contact_pairs(cache.n)
+    bits = np.unpackbits(cache.contacts, axis=1, bitorder="little")[:, :len(pair_i)]
+    maps, multiplicity = np.unique(bits, axis=0, return_counts=True)
+    return maps.astype(np.float32), multiplicity.astype(np.float64)
+
+def pair_masks(indices, n):
+    """
+    (S, pairs) 0/1 matrix: is contact pair p an H-H pair in sequence s?
+    """
+    pair_i, pair_j = contact_pairs(n)
+    is_h = (np.asarray(indices)[:, None] >> (n - 1 - np.arange(n))) & 1
+    return (is_h[:, pair_i] & is_h[:, pair_j]).astype(np.float32)
+
+def degeneracies(maps, multiplicity, indices, n):
+    """
+    (S, c_max + 1) number of walks with c H-H contacts for each sequence.
+    """
+    counts = np.rint(maps @ pair_masks(indices, n).T).astype(np.int64)
+    c_max = int(counts.max()) if counts.size else 0
+    g = np.empty((len(indices), c_max + 1))
+    for c in range(c_max + 1):
+        g[:, c] = multiplicity @ (counts == c)
+    return g
+
+def ground_state_probability(g, c0, kT, Epsilon):
+    """
+    Probability of the ground state at kT (scalar or one per row), for each row of g.
+    """
+    c = np.arange(g.shape[1])
+    kT = np.broadcast_to(np.asarray(kT, dtype=float), (len(g),))[:, None]
+    # Weights relative to the ground state, exp(-(E - E0)/kT) with E = -Epsilon c
+    w = np.exp(np.minimum(-Epsilon * (c0[:, None] - c[None, :]) / kT, 0.0))
+    w[c[None, :] > c0[:, None]] = 0.0
+    Z = (g * w).sum(axis=1)
+    return g[np.arange(len(g)), c0] / Z
+
+def folding_temperature(g, c0, Epsilon, kT_min=1e-3, kT_max=1e3, iterations=60):
+    """
+    kT where the ground state has probability 1/2, by bisection in log kT.
+
+    NaN where the ground state never reaches 1/2 (too degenerate) or
+    never drops below it within [kT_min, kT_max].
+    """
+    lo = np.full(len(g), np.log(kT_min))
+    hi = np.full(len(g), np.log(kT_max))
+
+    # P0 falls monotonically with kT
+    valid = (ground_state_probability(g, c0, kT_min, Epsilon) > 0.5) & \
+            (ground_state_probability(g, c0, kT_max, Epsilon) < 0.5)
+
+    for _ in range(iterations):
+        mid = 0.5 * (lo + hi)
+        above = ground_state_probability(g, c0, np.exp(mid), Epsilon) > 0.5
+        lo = np.where(above, mid, lo)
+        hi = np.where(above, hi, mid)
+
+    return np.where(valid, np.exp(0.5 * (lo + hi)), np.nan)
+
+def score_block(maps, multiplicity, indices, n, Epsilon, kT):
+    """
+    Ground-state summary of a block of sequences.
+    """
+    g = degeneracies(maps, multiplicity, indices, n)
+    c_levels = np.arange(g.shape[1])
+    present = g > 0
+
+    c0 = np.where(present, c_levels, -1).max(axis=1)
+    below = present & (c_levels[None, :] < c0[:, None])
+    c1 = np.where(below, c_levels, -1).max(axis=1)
+
+    return {
+        "index": np.asarray(indices),
+        "E0": 0 - Epsilon * c0,
+        "degeneracy": g[np.arange(len(g)), c0].astype(np.int64),
+        "gap": np.where(c1 >= 0, Epsilon * (c0 - c1), np.nan),
+        "p_ground": ground_state_probability(g, c0, kT, Epsilon),
+        "kT_fold": folding_temperature(g, c0, Epsilon)
+    }
+
+# Per-worker copy of the deduplicated contact maps
+_worker = {}
+
+def _init_worker(n, cache_dir):
+    _worker["maps"], _worker["multiplicity"] = unique_contact_maps(load_walk_cache(n, cache_dir))
+
+def _score_task(args):
+    indices, n, Epsilon, kT = args
+    return score_block(_worker["maps"], _worker["multiplicity"], indices, n, Epsilon, kT)
+
+def scan_sequences(n, Epsilon, kT=0.6, block_size=512, processes=None, cache_dir=default_cache_dir):
+    """
+    Score all HP sequences of length n.
+
+    Parameters
+    ----------
+    n : int
+        Chain length
+    Epsilon : float
+        H-H contact strength
+    kT : float
+        Reference temperature for p_ground
+    block_size : int
+        Sequences scored per matrix product
+    processes : int or None
+        Worker processes (default: all cores)
+    cache_dir : str
+        Directory of the walk cache (built on first use)
+
+    Returns
+    -------
+    results : dict
+        Arrays over the scored sequences (one per reverse pair):
+        sequence, E0, degeneracy, gap, p_ground and kT_fold.
+    """
+    # Build the cache once here, so workers only load it
+    load_walk_cache(n, cache_dir)
+
+    indices = canonical_indices(n)
+    tasks = [(indices[start:start + block_size], n, Epsilon, kT)
+             for start in range(0, len(indices), block_size)]
+
+    with Pool(processes, initializer=_init_worker, initargs=(n, cache_dir)) as pool:
+        blocks = pool.map(_score_task, tasks)
+
+    results = {key: np.concatenate([b[key] for b in blocks]) for key in blocks[0]}
+    results["sequence"] = [sequence_from_index(int(s), n) for s in results.pop("index")]
+    return results
+
+def designing_sequences(results):
+    """
+    Indices of sequences with a unique ground state, most stable first
+    (largest gap, then highest folding temperature).
+    """
+    unique = np.flatnonzero(results["degeneracy"] == 1)
+    kT_fold = np.nan_to_num(results["kT_fold"][unique], nan=0.0)
+    order = np.lexsort((-kT_fold, -results["gap"][unique]))
+    return unique[order]
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 sequence_scan.py <n> [output.csv] [kT]")
+        sys.exit()
+
+    Epsilon = 1
+
+    n = int(sys.argv[1])
+    output_file = sys.argv[2] if len(sys.argv) > 2 else f"sequence_scan_{n}.csv"
+    kT = float(sys.argv[3]) if len(sys.argv) > 3 else 0.6
+
+    results = scan_sequences(n, Epsilon, kT)
+
+    with open(output_file, "w") as f:
+        f.write("sequence,E0,degeneracy,gap,p_ground,kT_fold\n")
+        for i, sequence in enumerate(results["sequence"]):
+            f.write(f"{sequence},{results['E0'][i]},{results['degeneracy'][i]},{results['gap'][i]},"
+                    f"{results['p_ground'][i]},{results['kT_fold'][i]}\n")
+
+    designing = designing_sequences(results)
+
+    print("Length =", n)
+    print("Sequences scored (up to reversal) =", len(results["sequence"]))
+    print("Sequences with a unique ground state =", len(designing))
+    print("Results written to", output_file)
+    print()
+    print("Sequence    E0    Gap    p_ground    kT_fold")
+    for i in designing[:20]:
+        print(results["sequence"][i], "   ", results["E0"][i], "   ", results["gap"][i], "   ",
+              results["p_ground"][i], "   ", results["kT_fold"][i])
@@ -0,0 +1,121 @@
+import sys
+
+import numpy as np
+
+from analysis import cumulants, histogram_arrays
+from contact_cache import load_walk_cache
+
+"""
+Thermodynamics on arbitrary temperature grids from an energy histogram.
+
+The ensemble is first collapsed into per-energy degeneracies g(E) and
+per-macrostate sums of Rg and end-to-end distance (a histogram from
+enumeration.energy_histogram or contact_cache.WalkCache.histogram).
+Every temperature then costs one pass over the few energy levels, so a
+curve of thousands of points costs about as much as a single point.
+
+The sums over levels are those of analysis.cumulants. Cv peaks are
+located by root-finding on the analytic derivative
+    dCv/dkT = (k3 - 2 kT k2) / kT^4
+where k2 and k3 are the second and third cumulants of the energy.
+"""
+
+def temperature_sweep(histogram, temperatures):
+    """
+    Exact thermodynamics at every kT of a grid.
+
+    Returns
+    -------
+    results : dict
+        Arrays over the grid: kT, ln_Z, average_energy, Cv, avg_rg,
+        avg_rg2, average_end2end, F and S.
+    """
+    E, columns = histogram_arrays(histogram)
+    g = columns["count"]
+    kT = np.atleast_1d(np.asarray(temperatures, dtype=float))
+
+    ln_Z, p, mean, k2, k3 = cumulants(E, np.log(g), kT)
+
+    # Level probabilities over degeneracies give per-microstate weights
+    per_state = p / g[None, :]
+
+    return {
+        "kT": kT,
+        "ln_Z": ln_Z,
+        "average_energy": mean,
+        "Cv": k2 / kT ** 2,
+        "avg_rg": per_state @ columns["sum_rg"],
+        "avg_rg2": per_state @ columns["sum_rg2"],
+        "average_end2end": per_state @ columns["sum_end2end"],
+        "F": -kT * ln_Z,
+        "S": mean / kT + ln_Z
+    }
+
+def cv_slope(E, ln_g, kT):
+    """
+    kT^4 dCv/dkT = k3 - 2 kT k2, which has the sign of the Cv slope.
+    """
+    _, _, _, k2, k3 = cumulants(E, ln_g, kT)
+    return k3 - 2 * np.asarray(kT) * k2
+
+def cv_peaks(histogram, kT_min=0.05, kT_max=10.0, n_grid=400, tol=1e-10):
+    """
+    Locations of the Cv maxima in [kT_min, kT_max].
+
+    The slope is evaluated on a logarithmic grid to bracket every sign
+    change from + to -, then each bracket is refined by bisection.
+
+    Returns
+    -------
+    peaks : list of (kT, Cv)
+        Sorted by decreasing Cv, so peaks[0] is the folding temperature.
+    """
+    E, columns = histogram_arrays(histogram)
+    ln_g = np.log(columns["count"])
+
+    if len(E) < 2:
+        return []
+
+    grid = np.geomspace(kT_min, kT_max, n_grid)
+    slope = cv_slope(E, ln_g, grid)
+
+    peaks = []
+    for i in np.flatnonzero((slope[:-1] > 0) & (slope[1:] <= 0)):
+        lo, hi = grid[i], grid[i + 1]
+        while hi - lo > tol * hi:
+            mid = 0.5 * (lo + hi)
+            if cv_slope(E, ln_g, mid)[0] > 0:
+                lo = mid
+            else:
+                hi = mid
+        kT = 0.5 * (lo + hi)
+        _, _, _, k2, _ = cumulants(E, ln_g, kT)
+        peaks.append((float(kT), float(k2[0] / kT ** 2)))
+
+    return sorted(peaks, key=lambda peak: -peak[1])
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 temperature_sweep.py <sequence> [kT_min] [kT_max] [n_points]")
+        sys.exit()
+
+    Epsilon = 1
+
+    sequence = sys.argv[1]
+    kT_min = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    kT_max = float(sys.argv[3]) if len(sys.argv) > 3 else 5.0
+    n_points = int(sys.argv[4]) if len(sys.argv) > 4 else 50
+
+    histogram = load_walk_cache(len(sequence)).histogram(sequence, Epsilon)
+    sweep = temperature_sweep(histogram, np.linspace(kT_min, kT_max, n_points))
+
+    print("Sequence =", sequence)
+    print()
+    print("Temperature    Average_E    Cv    Average_Rg    F    S")
+    for i in range(len(sweep["kT"])):
+        print(sweep["kT"][i], "   ", sweep["average_energy"][i], "   ", sweep["Cv"][i], "   ",
+              sweep["avg_rg"][i], "   ", sweep["F"][i], "   ", sweep["S"][i])
+
+    print()
+    for kT, Cv in cv_peaks(histogram, kT_min, kT_max):
+        print("Cv peak at kT =", kT, " Cv =", Cv)
@@ -0,0 +1,219 @@
+import math
+import random
+import sys
+from multiprocessing import Pool
+
+import numpy as np
+
+from autocorrelation import integrated_time
+from campaign import seed_for
+from MC import Chain, HarmonicRestraint, run_chain, straight_path
+from wham import block_resample, solve_biased
+
+"""
+Umbrella sampling of the distance d_ij between two beads, combined with WHAM.
+
+Every window is an MC run biased by HarmonicRestraint(i, j, k, d0) around
+its own center d0, so together the windows cover the whole range of d,
+including distances that an unbiased run at low temperature never visits.
+The windows are independent and run in a process pool, each with its own
+random stream seeded from the master seed and the window index.
+
+Since d is an integer, the d series of the windows are histogrammed
+exactly and combined with the WHAM equations (wham.solve_biased) using
+the known bias factors exp(-k (d - d0_k)^2 / kT). The result is the
+unbiased distribution P(d) and the potential of mean force
+    PMF(d) = -kT ln P(d)
+shifted to a minimum of 0, with block-bootstrap error bars. At fixed d
+the bias is constant, so HP energies pooled over all windows give the
+unbiased <E>(d) as well.
+"""
+
+def reachable_distances(bead_i, bead_j):
+    """
+    Manhattan distances beads i and j can be at on the square lattice.
+
+    d has the parity of j - i and is at most j - i, so it runs over
+    1, 3, 5, ... or 2, 4, 6, ...
+    """
+    separation = abs(bead_j - bead_i)
+    return list(range(2 - separation % 2, separation + 1, 2))
+
+def run_window(args):
+    """
+    Worker: one biased MC run, returning its d and HP energy series.
+    """
+    (sequence, Beta, Epsilon, bead_i, bead_j, k_force, d0,
+     n_steps, n_equil, stride, seed, move_weights) = args
+
+    rng = random.Random(seed)
+    chain = Chain(straight_path(sequence), sequence, Epsilon)
+    restraint = HarmonicRestraint(bead_i, bead_j, k_force, d0)
+
+    run_chain(chain, n_equil, Beta, move_weights=move_weights, rng=rng, bias=restraint)
+
+    distances = []
+    energies = []
+
+    def record(step, path, energy):
+        a = path[bead_i]
+        b = path[bead_j]
+        distances.append(abs(a[0] - b[0]) + abs(a[1] - b[1]))
+        energies.append(energy)
+
+    accepted_moves, invalid_moves = run_chain(chain, n_steps, Beta, record, stride,
+                                              first_step=n_equil, move_weights=move_weights,
+                                              rng=rng, bias=restraint)
+
+    return {
+        "d0": d0,
+        "k_force": k_force,
+        "seed": seed,
+        "distances": np.array(distances, dtype=int),
+        "energies": np.array(energies, dtype=float),
+        "acceptance_ratio": accepted_moves / n_steps,
+        "invalid_moves": invalid_moves
+    }
+
+def run_windows(sequence, Beta, Epsilon, bead_i, bead_j, centers=None, k_force=0.5,
+                n_steps=100000, n_equil=10000, stride=10, master_seed=0,
+                processes=None, move_weights=None):
+    """
+    Run one biased MC window per restraint center in parallel.
+
+    Parameters
+    ----------
+    sequence : str
+        HP sequence
+    Beta : float
+        Inverse temperature
+    Epsilon : float
+        H-H contact strength
+    bead_i, bead_j : int
+        Restrained beads
+    centers : list of int or None
+        Restraint centers d0 (default: reachable_distances)
+    k_force : float
+        Spring constant of every window
+    n_steps : int
+        Production steps per window
+    n_equil : int
+        Steps discarded at the start of every window
+    stride : int
+        Record every stride-th step
+    master_seed : int
+        Seed from which every window's seed is derived
+    processes : int or None
+        Worker processes (default: all cores)
+    move_weights : dict or None
+        Mixing weights over MC.move_set (default: reptation only)
+
+    Returns
+    -------
+    windows : list of dict
+        One per center, in order: d0, k_force, seed, distances, energies,
+        acceptance_ratio and invalid_moves.
+    """
+    if centers is None:
+        centers = reachable_distances(bead_i, bead_j)
+
+    tasks = [
+        (sequence, Beta, Epsilon, bead_i, bead_j, k_force, d0,
+         n_steps, n_equil, stride, seed_for(master_seed, w), move_weights)
+        for w, d0 in enumerate(centers)
+    ]
+
+    with Pool(processes) as pool:
+        windows = pool.map(run_window, tasks)
+
+    return windows
+
+def window_pmf(windows, Beta, tol=1e-10, max_iter=100000):
+    """
+    Combine umbrella windows with WHAM into P(d), PMF(d) and <E>(d).
+
+    Returns
+    -------
+    results : dict
+        d (visited distances), P, PMF (in units of energy, minimum 0),
+        average_energy (unbiased HP energy at each d), f (dimensionless
+        free energy of every window) and iterations.
+    """
+    d = np.unique(np.concatenate([w["distances"] for w in windows]))
+    index = {value: m for m, value in enumerate(d.tolist())}
+
+    counts = np.zeros((len(windows), len(d)))
+    sum_energy = np.zeros(len(d))
+    for k, w in enumerate(windows):
+        idx = np.array([index[value] for value in w["distances"].tolist()], dtype=int)
+        counts[k] = np.bincount(idx, minlength=len(d))
+        sum_energy += np.bincount(idx, weights=w["energies"], minlength=len(d))
+
+    n_frames = counts.sum(axis=1)
+    log_bias = np.array([-Beta * w["k_force"] * (d - w["d0"]) ** 2 for w in windows])
+    ln_P, f, iterations = solve_biased(counts, n_frames, log_bias, tol, max_iter)
+
+    pmf = -ln_P / Beta
+    return {
+        "d": d,
+        "P": np.exp(ln_P),
+        "PMF": pmf - pmf.min(),
+        "average_energy": sum_energy / counts.sum(axis=0),
+        "f": f,
+        "iterations": iterations
+    }
+
+def umbrella_pmf(windows, Beta, n_bootstrap=100, block_sizes=None, seed=0):
+    """
+    window_pmf with bootstrap standard errors of the PMF.
+
+    The bootstrap block length of each window defaults to the integrated
+    autocorrelation time of its d series, rounded up. Distances missing
+    from a resample are left out of its error estimate.
+    """
+    results = window_pmf(windows, Beta)
+
+    if n_bootstrap:
+        if block_sizes is None:
+            block_sizes = [max(1, math.ceil(integrated_time(w["distances"].astype(float))[0]))
+                           for w in windows]
+
+        rng = random.Random(seed)
+        samples = np.full((n_bootstrap, len(results["d"])), np.nan)
+        for b in range(n_bootstrap):
+            resampled = [block_resample(w, size, rng) for w, size in zip(windows, block_sizes)]
+            sample = window_pmf(resampled, Beta)
+            samples[b, np.searchsorted(results["d"], sample["d"])] = sample["PMF"]
+
+        results["err_PMF"] = np.nanstd(samples, axis=0, ddof=1)
+
+    return results
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print("Usage: python3 umbrella.py <sequence> <bead_i> <bead_j> [n_steps] [k_force] [kT]")
+        sys.exit()
+
+    Epsilon = 1
+
+    sequence = sys.argv[1]
+    bead_i = int(sys.argv[2])
+    bead_j = int(sys.argv[3])
+    n_steps = int(sys.argv[4]) if len(sys.argv) > 4 else 100000
+    k_force = float(sys.argv[5]) if len(sys.argv) > 5 else 0.5
+    kT = float(sys.argv[6]) if len(sys.argv) > 6 else 0.6
+    Beta = 1.0 / kT
+
+    windows = run_windows(sequence, Beta, Epsilon, bead_i, bead_j, k_force=k_force,
+                          n_steps=n_steps, move_weights={"reptation": 1.0, "pivot": 0.2})
+    results = umbrella_pmf(windows, Beta)
+
+    print("Sequence =", sequence)
+    print("Beads =", bead_i, bead_j)
+    print("kT =", kT, " k_force =", k_force)
+    print("Windows:", len(windows), " WHAM iterations:", results["iterations"])
+    print()
+    print("d    PMF    Average_E    P")
+    for m, d in enumerate(results["d"]):
+        print(d, "   ", results["PMF"][m], "+/-", results["err_PMF"][m], "   ",
+              results["average_energy"][m], "   ", results["P"][m])
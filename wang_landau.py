@@ -0,0 +1,181 @@
+import math
+import random
+import sys
+from collections import Counter
+
+import numpy as np
+
+from analysis import cumulants
+from MC import Chain, move_chooser, move_set, straight_path
+
+"""
+Wang-Landau estimate of the density of states g(E) for the HP model.
+
+A random walk in conformation space is accepted with probability
+min(1, g(E_old) / g(E_new)); after every visit ln g(E) grows by ln f.
+When the energy histogram is flat, ln f is halved and the histogram
+is reset. Once ln f is small, g(E) gives Z, <E>, Cv and S at any
+temperature without further sampling.
+"""
+
+# A mix of local and global moves keeps the walk ergodic for compact states
+default_move_weights = {"reptation": 1.0, "end": 1.0, "corner": 1.0, "crankshaft": 1.0, "pivot": 0.5}
+
+def is_flat(histogram, flatness):
+    """
+    True if every visited energy has at least flatness * mean visits.
+    """
+    counts = list(histogram.values())
+    return min(counts) >= flatness * sum(counts) / len(counts)
+
+def wang_landau(sequence, Epsilon, ln_f_initial=1.0, ln_f_final=1e-6, flatness=0.8,
+                check_every=10000, max_steps=None, move_weights=None, initial_path=None,
+                rng=None):
+    """
+    Estimate ln g(E) by Wang-Landau sampling.
+
+    Parameters
+    ----------
+    sequence : str
+        HP sequence
+    Epsilon : float
+        H-H contact strength
+    ln_f_initial, ln_f_final : float
+        Start and stop values of the modification factor ln f
+    flatness : float
+        Histogram is flat when min(H) >= flatness * mean(H)
+    check_every : int
+        Steps between flatness checks
+    max_steps : int or None
+        Hard limit on the number of steps
+    move_weights : dict or None
+        Mixing weights over MC.move_set
+    initial_path : list of tuples or None
+        Starting conformation (default: straight)
+    rng : random.Random or None
+        Random number stream (default: the global random module)
+
+    Returns
+    -------
+    ln_g : dict
+        Energy -> ln g(E), defined up to an additive constant
+    info : dict
+        Number of steps, final ln f and number of ln f stages
+    """
+    if rng is None:
+        rng = random
+    if move_weights is None:
+        move_weights = default_move_weights
+    if initial_path is None:
+        initial_path = straight_path(sequence)
+
+    chain = Chain(initial_path, sequence, Epsilon)
+    choose = move_chooser(move_weights, rng)
+
+    ln_g = {}
+    histogram = Counter()
+    ln_f = ln_f_initial
+    stages = 0
+    step = 0
+
+    while ln_f > ln_f_final and (max_steps is None or step < max_steps):
+        step += 1
+
+        old_energy = chain.energy
+        undo = move_set[choose()](chain, rng)
+
+        if undo is not None:
+            new_energy = chain.contact_energy()
+            diff = ln_g.get(old_energy, 0.0) - ln_g.get(new_energy, 0.0)
+            if diff >= 0 or rng.random() < math.exp(diff):
+                chain.energy = new_energy
+            else:
+                undo()
+
+        E = chain.energy
+        ln_g[E] = ln_g.get(E, 0.0) + ln_f
+        histogram[E] += 1
+
+        if step % check_every == 0 and is_flat(histogram, flatness):
+            ln_f /= 2
+            stages += 1
+            histogram = Counter()
+
+    info = {
+        "n_steps": step,
+        "ln_f": ln_f,
+        "stages": stages
+    }
+
+    return ln_g, info
+
+def normalize_dos(ln_g, total_states=1.0):
+    """
+    Shift ln g(E) so that sum over E of g(E) equals total_states.
+
+    Pass the number of conformations (e.g. len(enumerate_paths(sequence))
+    for short chains) to get absolute entropies; the default gives
+    probabilities of each energy at infinite temperature.
+    """
+    top = max(ln_g.values())
+    ln_sum = top + math.log(sum(math.exp(v - top) for v in ln_g.values()))
+    shift = math.log(total_states) - ln_sum
+    return {E: v + shift for E, v in ln_g.items()}
+
+def thermodynamics_from_dos(ln_g, temperatures):
+    """
+    Thermodynamics at every kT in temperatures from a density of states.
+
+    The sums over energy levels are those of analysis.cumulants, done in
+    the log domain so they do not overflow at low kT.
+
+    Returns
+    -------
+    results : dict
+        Lists over temperatures of "Z", "ln_Z", "average_energy",
+        "Cv", "S" (= <E>/kT + ln Z, as analysis.entropy_from_definition)
+        and "F" (= -kT ln Z)
+    """
+    levels = sorted(ln_g)
+    kT = np.atleast_1d(np.asarray(temperatures, dtype=float))
+
+    ln_Z, _, mean, k2, _ = cumulants(np.array(levels, dtype=float), [ln_g[E] for E in levels], kT)
+
+    return {
+        "kT": list(temperatures),
+        "Z": [math.exp(lz) if lz < 700 else math.inf for lz in ln_Z.tolist()],
+        "ln_Z": ln_Z.tolist(),
+        "average_energy": mean.tolist(),
+        "Cv": (k2 / kT ** 2).tolist(),
+        "S": (mean / kT + ln_Z).tolist(),
+        "F": (-kT * ln_Z).tolist()
+    }
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 wang_landau.py <sequence> [ln_f_final] [total_states]")
+        sys.exit()
+
+    Epsilon = 1
+    temperatures = [0.6, 0.8, 1.0, 1.2, 1.5, 2.0, 3.0, 4.0, 5.0]
+
+    sequence = sys.argv[1]
+    ln_f_final = float(sys.argv[2]) if len(sys.argv) > 2 else 1e-6
+    total_states = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+
+    ln_g, info = wang_landau(sequence, Epsilon, ln_f_final=ln_f_final)
+    ln_g = normalize_dos(ln_g, total_states)
+
+    print("Sequence =", sequence)
+    print("Steps =", info["n_steps"], " stages =", info["stages"], " final ln f =", info["ln_f"])
+
+    print("\nDensity of states (Energy : g(E))")
+    for E in sorted(ln_g):
+        print(f"{E} : {math.exp(ln_g[E])}")
+
+    results = thermodynamics_from_dos(ln_g, temperatures)
+
+    print()
+    print("Temperature    Average_E    Cv    S")
+    for i, kT in enumerate(results["kT"]):
+        print(kT, "   ", results["average_energy"][i], "   ", results["Cv"][i], "   ", results["S"][i])
@@ -0,0 +1,256 @@
+import math
+import random
+import sys
+
+import numpy as np
+
+from analysis import load_trajectory
+from autocorrelation import integrated_time, trajectory_series
+from temperature_sweep import cv_peaks, temperature_sweep
+
+"""
+Multiple-histogram (WHAM) reweighting of MC runs at different temperatures.
+
+Energy histograms H_k(E) from runs at kT_k, with N_k frames each, are
+combined into one density of states by iterating the self-consistent
+equations
+    g(E) = sum_k H_k(E) / sum_k N_k exp(f_k - E/kT_k)
+    exp(-f_k) = sum_E g(E) exp(-E/kT_k)
+in the log domain until the free energies f_k stop changing. At fixed
+energy the conformations are distributed the same way at every
+temperature, so per-energy averages of Rg and end-to-end distance pooled
+over all runs give <Rg>(T) as well.
+
+The result is a histogram in the format of enumeration.energy_histogram,
+with count holding g(E) normalized to sum 1, so temperature_sweep gives
+continuous <E>, Cv, <Rg> curves (ln Z, F and S up to a constant).
+Error bars come from a block bootstrap over the frames of every run.
+"""
+
+def logsumexp(a, axis=None):
+    top = np.max(a, axis=axis, keepdims=True)
+    top = np.where(np.isfinite(top), top, 0.0)
+    out = np.log(np.sum(np.exp(a - top), axis=axis, keepdims=True)) + top
+    return np.squeeze(out, axis=axis) if axis is not None else out.item()
+
+def make_run(kT, energies, rg=None, end2end=None):
+    """
+    One MC run for reweighting: its kT and per-frame series.
+    """
+    return {
+        "kT": kT,
+        "energies": np.asarray(energies, dtype=float),
+        "rg": None if rg is None else np.asarray(rg, dtype=float),
+        "end2end": None if end2end is None else np.asarray(end2end, dtype=float)
+    }
+
+def run_from_trajectory(kT, filename):
+    """
+    Read a trajectory (text or .hptraj) into a run with Rg and R_ee series.
+    """
+    trajectory, energies = load_trajectory(filename)
+    series = trajectory_series(trajectory, energies)
+    return make_run(kT, series["energy"], series["rg"], series["end2end"])
+
+def solve_biased(counts, n_frames, log_bias, tol=1e-10, max_iter=100000):
+    """
+    WHAM equations for runs that sample the same states with known biases.
+
+    Parameters
+    ----------
+    counts : (K, L) array, visits of each state bin in each run
+    n_frames : (K,) array of frames per run
+    log_bias : (K, L) array, log of the bias factor of run k on bin x,
+        e.g. -E/kT_k for temperatures or -w_k(x)/kT for umbrella windows
+
+    Returns
+    -------
+    ln_p : (L,) array, unbiased log weights normalized so that sum p = 1
+    f : (K,) array of dimensionless free energies, f[0] = 0
+    iterations : int
+    """
+    ln_H = np.log(counts.sum(axis=0))
+    ln_N = np.log(n_frames)
+
+    f = np.zeros(len(n_frames))
+    for iteration in range(1, max_iter + 1):
+        ln_p = ln_H - logsumexp(ln_N[:, None] + f[:, None] + log_bias, axis=0)
+        new_f = -logsumexp(ln_p[None, :] + log_bias, axis=1)
+        new_f -= new_f[0]
+        converged = np.max(np.abs(new_f - f)) < tol
+        f = new_f
+        if converged:
+            break
+
+    return ln_p - logsumexp(ln_p), f, iteration
+
+def solve_wham(levels, counts, n_frames, Betas, tol=1e-10, max_iter=100000):
+    """
+    Self-consistent WHAM equations across temperatures, in the log domain.
+
+    Parameters
+    ----------
+    levels : (L,) array of energies
+    counts : (K, L) array, visits of each level in each run
+    n_frames : (K,) array of frames per run
+    Betas : (K,) array of 1/kT per run
+
+    Returns
+    -------
+    ln_g : (L,) array, normalized so that sum g = 1
+    f : (K,) array of dimensionless free energies, f[0] = 0
+    iterations : int
+    """
+    return solve_biased(counts, n_frames, -np.outer(Betas, levels), tol, max_iter)
+
+def wham_histogram(runs, tol=1e-10, max_iter=100000):
+    """
+    Combine runs into a normalized density of states with observable sums.
+
+    Returns
+    -------
+    histogram : dict
+        Energy -> {"count": g(E), "sum_rg", "sum_rg2", "sum_end2end"},
+        with sum of g equal to 1 and sums equal to g(E) times the pooled
+        per-energy averages (NaN if a run has no such series).
+    info : dict
+        f (free energy of every run), iterations, ln_g (dict, usable
+        with wang_landau.thermodynamics_from_dos and normalize_dos).
+    """
+    all_energies = np.concatenate([run["energies"] for run in runs])
+    levels, inverse = np.unique(all_energies, return_inverse=True)
+
+    counts = np.zeros((len(runs), len(levels)))
+    start = 0
+    for k, run in enumerate(runs):
+        idx = inverse[start:start + len(run["energies"])]
+        counts[k] = np.bincount(idx, minlength=len(levels))
+        start += len(run["energies"])
+
+    n_frames = counts.sum(axis=1)
+    Betas = np.array([1.0 / run["kT"] for run in runs])
+    ln_g, f, iterations = solve_wham(levels, counts, n_frames, Betas, tol, max_iter)
+
+    visits = counts.sum(axis=0)
+    g = np.exp(ln_g)
+
+    def pooled_average(key, power=1):
+        if any(run[key] is None for run in runs):
+            return np.full(len(levels), np.nan)
+        values = np.concatenate([run[key] for run in runs]) ** power
+        return np.bincount(inverse, weights=values, minlength=len(levels)) / visits
+
+    rg = pooled_average("rg")
+    rg2 = pooled_average("rg", 2)
+    end2end = pooled_average("end2end")
+
+    histogram = {}
+    for i, E in enumerate(levels):
+        histogram[E.item()] = {
+            "count": float(g[i]),
+            "sum_rg": float(g[i] * rg[i]),
+            "sum_rg2": float(g[i] * rg2[i]),
+            "sum_end2end": float(g[i] * end2end[i])
+        }
+
+    info = {
+        "f": f,
+        "iterations": iterations,
+        "ln_g": {E.item(): float(v) for E, v in zip(levels, ln_g)}
+    }
+
+    return histogram, info
+
+def block_resample(run, block_size, rng):
+    """
+    Bootstrap copy of a run made of randomly chosen blocks of frames.
+
+    Every per-frame array of the run (energies, rg, end2end, or the
+    distances of an umbrella window) is resampled with the same blocks;
+    other entries are copied as they are.
+    """
+    n = len(run["energies"])
+    n_blocks = max(n // block_size, 1)
+    starts = [rng.randrange(n - block_size + 1) for _ in range(n_blocks)]
+    idx = np.concatenate([np.arange(s, s + block_size) for s in starts])
+
+    resampled = dict(run)
+    for key, value in run.items():
+        if isinstance(value, np.ndarray) and value.ndim > 0 and len(value) == n:
+            resampled[key] = value[idx]
+    return resampled
+
+def reweight(runs, temperatures, n_bootstrap=100, block_sizes=None, seed=0):
+    """
+    <E>, Cv, <Rg>, <R_ee>, F and S on a temperature grid, with error bars.
+
+    Parameters
+    ----------
+    runs : list of dict
+        From make_run or run_from_trajectory
+    temperatures : list of float
+        kT grid for the curves
+    n_bootstrap : int
+        Number of bootstrap resamples (0 for no error bars)
+    block_sizes : list of int or None
+        Bootstrap block length per run; by default the integrated
+        autocorrelation time of its energy series, rounded up
+    seed : int
+        Seed of the bootstrap random stream
+
+    Returns
+    -------
+    results : dict
+        The temperature_sweep arrays, err_<key> bootstrap standard
+        errors for each of them, the Cv peaks, and the WHAM info.
+    """
+    histogram, info = wham_histogram(runs)
+    results = temperature_sweep(histogram, temperatures)
+    results["cv_peaks"] = cv_peaks(histogram, min(temperatures), max(temperatures))
+    results["wham"] = info
+
+    if n_bootstrap:
+        if block_sizes is None:
+            block_sizes = [max(1, math.ceil(integrated_time(run["energies"])[0])) for run in runs]
+
+        rng = random.Random(seed)
+        keys = ["average_energy", "Cv", "avg_rg", "avg_rg2", "average_end2end", "F", "S"]
+        samples = {key: [] for key in keys}
+
+        for _ in range(n_bootstrap):
+            resampled = [block_resample(run, b, rng) for run, b in zip(runs, block_sizes)]
+            sweep = temperature_sweep(wham_histogram(resampled)[0], temperatures)
+            for key in keys:
+                samples[key].append(sweep[key])
+
+        for key in keys:
+            results["err_" + key] = np.std(samples[key], axis=0, ddof=1)
+
+    return results
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 wham.py <kT>:<trajectory_file> [<kT>:<trajectory_file> ...]")
+        sys.exit()
+
+    runs = []
+    for arg in sys.argv[1:]:
+        kT, filename = arg.split(":", 1)
+        runs.append(run_from_trajectory(float(kT), filename))
+
+    kTs = [run["kT"] for run in runs]
+    grid = np.linspace(min(kTs), max(kTs), 50)
+    results = reweight(runs, grid)
+
+    print("Runs:", len(runs))
+    print("WHAM iterations:", results["wham"]["iterations"])
+    print()
+    print("Temperature    Average_E    Cv    Average_Rg")
+    for i, kT in enumerate(results["kT"]):
+        print(kT, "   ", results["average_energy"][i], "+/-", results["err_average_energy"][i], "   ",
+              results["Cv"][i], "+/-", results["err_Cv"][i], "   ",
+              results["avg_rg"][i], "+/-", results["err_avg_rg"][i])
+
+    print()
+    for kT, Cv in results["cv_peaks"]:
+        print("Cv peak at kT =", kT, " Cv =", Cv)